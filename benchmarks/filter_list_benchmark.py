@@ -0,0 +1,102 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Compare claw.patcher.filter_list with a rule by rule implementation.
+
+Filters 10000 items (node template like dicts and plain strings) with 500
+include rules, of which a few match.
+
+    $ python benchmarks/filter_list_benchmark.py [ITEMS] [RULES]
+"""
+
+import random
+import sys
+import timeit
+
+from claw import patcher
+
+WORDS = ['node', 'host', 'vm', 'security', 'group', 'rule', 'plugin',
+         'agent', 'network', 'subnet', 'port', 'floating', 'ip', 'router',
+         'keypair', 'volume', 'server', 'manager', 'rest', 'riemann']
+
+
+def unindexed_filter_list(current_value, include):
+    # filter_list before it was indexed
+    def is_included(_item):
+        for included in include:
+            if isinstance(included, basestring):
+                if included in _item:
+                    return True
+            elif isinstance(included, dict):
+                if all([value in (_item.get(key) or '')
+                        for key, value in included.items()]):
+                    return True
+            else:
+                raise NotImplementedError(str(included))
+        return False
+    return filter(is_included, current_value)
+
+
+def name(rand):
+    return '_'.join(rand.choice(WORDS) for _ in range(4))
+
+
+def data(num_items, num_rules):
+    rand = random.Random(0)
+    names = ['{0}_{1}'.format(name(rand), i) for i in range(num_items)]
+    strings = names
+    dicts = [{'name': n,
+              'type': 'cloudify.nodes.{0}'.format(name(rand)),
+              'properties': {'resource_id': n}} for n in names]
+    # Mostly rules that do not match, so every item is checked against all
+    # of them
+    string_rules = (['{0}_{1}x'.format(name(rand), i)
+                     for i in range(num_rules - num_rules / 10)] +
+                    rand.sample(names, num_rules / 10))
+    dict_rules = ([{'type': 'cloudify.nodes.{0}x'.format(name(rand))}
+                   for _ in range(num_rules / 2)] +
+                  [{'name': rule} for rule in string_rules[num_rules / 2:]])
+    return strings, string_rules, dicts, dict_rules
+
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def report(name, items, include):
+    expected = unindexed_filter_list(items, include)
+    if patcher.filter_list(items, include) != expected:
+        sys.exit('error: filter_list returned different items')
+    unindexed = best_of(lambda: unindexed_filter_list(items, include))
+    indexed = best_of(lambda: patcher.filter_list(items, include))
+    print '{0:<8} unindexed {1:8.4f}s  filter_list {2:8.4f}s  x{3:.1f}' \
+          '  ({4} included)'.format(name, unindexed, indexed,
+                                    unindexed / indexed, len(expected))
+
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    num_rules = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    strings, string_rules, dicts, dict_rules = data(num_items, num_rules)
+    print '{0} items, {1} rules'.format(num_items, num_rules)
+    report('strings', strings, string_rules)
+    report('dicts', dicts, dict_rules)
+    report('mixed', dicts, string_rules[:num_rules / 2] +
+           dict_rules[:num_rules / 2])
+
+
+if __name__ == '__main__':
+    main()
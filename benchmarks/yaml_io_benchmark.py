@@ -0,0 +1,94 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Compare claw.yaml_io with plain PyYAML on the bundled templates.
+
+The suites and blueprints templates are scaled up (by the factor given as the
+first argument, 200 by default) to approximate the size of the system tests
+suites.yaml and of manager blueprints.
+
+    $ python benchmarks/yaml_io_benchmark.py [SCALE]
+"""
+
+import copy
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import yaml
+
+from claw import resources
+from claw import yaml_io
+
+
+def scaled_document(scale):
+    suites = yaml.safe_load(resources.get('templates/suites.template.yaml'))
+    blueprints = yaml.safe_load(resources.get(
+        'templates/blueprints.template.yaml'))
+    # Deep copies, so the scaled document is not dumped as aliases
+    return dict(('section{0}'.format(i), copy.deepcopy(
+        {'suites': suites, 'blueprints': blueprints}))
+        for i in range(scale))
+
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def report(name, pure, current):
+    print '{0:<12} PyYAML {1:8.4f}s  yaml_io {2:8.4f}s  x{3:.1f}'.format(
+        name, pure, current, pure / current)
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    document = scaled_document(scale)
+    text = yaml.safe_dump(document, default_flow_style=False)
+    print 'libyaml: {0}, document: {1} KB'.format(
+        yaml_io.SafeLoader is not yaml.SafeLoader, len(text) / 1024)
+
+    pure_output = yaml.safe_dump(document, default_flow_style=False)
+    output = yaml_io.dump(document, default_flow_style=False)
+    if output != pure_output:
+        sys.exit('error: yaml_io output differs from PyYAML output')
+    if yaml_io.load(text) != yaml.safe_load(text):
+        sys.exit('error: yaml_io loaded a different document')
+
+    report('load',
+           best_of(lambda: yaml.safe_load(text)),
+           best_of(lambda: yaml_io.load(text)))
+    report('dump',
+           best_of(lambda: yaml.safe_dump(document,
+                                          default_flow_style=False)),
+           best_of(lambda: yaml_io.dump(document,
+                                        default_flow_style=False)))
+
+    with tempfile.NamedTemporaryFile(suffix='.yaml') as f:
+        f.write(text)
+        f.flush()
+        # Age the file so load_file may cache it
+        past = time.time() - 60
+        os.utime(f.name, (past, past))
+        yaml_io.load_file(f.name)
+        report('load_file',
+               best_of(lambda: yaml.safe_load(open(f.name).read())),
+               best_of(lambda: yaml_io.load_file(f.name)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import json
+import os
+import tempfile
+import time
+
+from claw.settings import settings
+
+# Directories (and files) modified this recently may still change without
+# their mtime changing (coarse filesystem timestamps), so cache entries
+# derived from them are not trusted on the next run.
+RACY_WINDOW = 2
+
+
+def load(name):
+    """Load the JSON cache file `name` from the cache dir (None if missing
+    or unreadable)."""
+    data = read(name)
+    if data is None:
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def store(name, value):
+    """Atomically write `value` as the JSON cache file `name`."""
+    write(name, json.dumps(value))
+
+
+def read(name):
+    """Raw content of the cache file `name` (None if missing or
+    unreadable)."""
+    try:
+        with open(settings.cache_dir / name, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def write(name, data):
+    """Atomically write `data` as the cache file `name`.
+
+    Caches are best-effort, so failing to write one (e.g. a read-only
+    claw_home) is silently ignored.
+    """
+    cache_dir = settings.cache_dir
+    try:
+        cache_dir.makedirs_p()
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir,
+                                        prefix='.{0}.'.format(name))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_path, cache_dir / name)
+    except (IOError, OSError):
+        pass
+
+
+def mtime(file_path):
+    """mtime of `file_path` or None if it does not exist."""
+    try:
+        return os.stat(file_path).st_mtime
+    except OSError:
+        return None
+
+
+def is_racy(file_mtime, now=None):
+    return file_mtime is not None and (
+        file_mtime >= (now or time.time()) - RACY_WINDOW)
+
+
+def code_fingerprint():
+    """mtimes of claw's own modules, for caches derived from claw code."""
+    claw_dir = os.path.dirname(os.path.abspath(__file__))
+    return sorted([name, mtime(os.path.join(claw_dir, name))]
+                  for name in os.listdir(claw_dir) if name.endswith('.py'))
@@ -14,15 +14,7 @@
 # limitations under the License.
 ############
 
-import sys
-
-import sh
-
-
-def bake(cmd):
-    return cmd.bake(_out=lambda line: sys.stdout.write(line),
-                    _err=lambda line: sys.stderr.write(line))
-
+from claw import runner
 
 try:
     from cloudify_cli.utils import load_cloudify_working_dir_settings
@@ -34,7 +26,7 @@ except ImportError:
     NEW_CLI = True
 
 
-cfy = bake(sh.cfy)
+cfy = runner.Command('cfy')
 
 
 def teardown(force, ignore_deployments):
@@ -92,7 +84,7 @@ def init(conf):
     if NEW_CLI:
         pass
     else:
-        cfy.init()
+        cfy.init().wait()
         with conf.patch.cli_config as patch:
             patch.obj['colors'] = True
 
@@ -0,0 +1,55 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import hashlib
+import imp
+import marshal
+import os
+
+from claw import cache
+
+
+def compile_script(script_path):
+    """Compile the script at `script_path` the way `execfile` does.
+
+    Code objects are cached (marshalled, like .pyc files) under the cache dir,
+    keyed by the script path, its mtime and size and the interpreter's magic
+    number, so unchanged scripts are not parsed and compiled again.
+    """
+    # path objects (unicode subclasses) can't be marshalled
+    script_path = (unicode if isinstance(script_path, unicode) else str)(
+        script_path)
+    stat = os.stat(script_path)
+    key = [script_path, stat.st_mtime, stat.st_size]
+    # The path as given ends up as the code's co_filename (__file__ is set by
+    # the caller), so it is part of the cache file name too
+    name = 'code-{0}.pyc'.format(hashlib.sha1(marshal.dumps(
+        (os.path.abspath(script_path), script_path))).hexdigest())
+    magic = imp.get_magic()
+    data = cache.read(name)
+    if data and data.startswith(magic):
+        try:
+            cached_key, code = marshal.loads(data[len(magic):])
+            if cached_key == key:
+                return code
+        except (EOFError, ValueError, TypeError):
+            pass
+    with open(script_path, 'rU') as f:
+        source = f.read()
+    code = compile(source, script_path, 'exec', 0, True)
+    if not cache.is_racy(stat.st_mtime):
+        cache.write(name, magic + marshal.dumps((key, code)))
+    return code
@@ -14,27 +14,47 @@
 # limitations under the License.
 ############
 
+import copy
+import fnmatch
+import functools
+import glob
+import json
 import os
-import shutil
 import sys
-import tempfile
 import time
+import traceback
+from contextlib import contextmanager
 
 import argh
-import requests
 from argh.decorators import arg
+from path import path
 
-import cosmo_tester
-from cosmo_tester.framework import util
-
-from claw import cfy
+from claw import cache
+from claw import code_cache
+from claw import daemon as claw_daemon
 from claw import exec_env
-from claw import patcher
+from claw import executions
+from claw import fingerprint
+from claw import logs
+from claw import parallel
 from claw import resources
+from claw import store
+from claw import yaml_io
+from claw.lazy import lazy_import
 from claw.state import current_configuration
 from claw.configuration import Configuration, CURRENT_CONFIGURATION
-from claw.settings import settings
+from claw.settings import settings, CLI_BACKEND
 from claw.completion import completion
+from claw.script_index import script_index
+from claw.variables import Variables
+
+# Heavy dependencies are only imported once a command actually uses them
+requests = lazy_import('requests')
+cosmo_tester = lazy_import('cosmo_tester')
+cfy = lazy_import('claw.cfy')
+rest = lazy_import('claw.rest')
+rest_client = lazy_import('claw.rest_client')
+runner = lazy_import('claw.runner')
 
 INIT_EXISTS = argh.CommandError('Configuration already exists. Use --reset'
                                 ' to overwrite.')
@@ -43,7 +63,11 @@ ALREADY_INITIALIZED = argh.CommandError('Configuration already initialized. '
                                         'Use --reset to overwrite.')
 NO_BOOTSTRAP = argh.CommandError('Configuration not bootstrapped.')
 NO_SUCH_CONFIGURATION = argh.CommandError('No such configuration.')
-STOP_DEPLOYMENT_ENVIRONMENT = '_stop_deployment_environment'
+STATUS_CACHE = 'status.json'
+STATUS_MAX_AGE = 10
+STATUS_CONNECT_TIMEOUT = 3
+STATUS_READ_TIMEOUT = 5
+STATUS_JOBS = 20
 
 
 app = argh.EntryPoint('claw')
@@ -82,35 +106,106 @@ def init(suites_yaml=None,
 
 
 @command
-@arg('configuration', completer=completion.all_configurations)
+@arg('configurations', nargs='*', completer=completion.all_configurations,
+     help='configuration names or glob patterns')
+@arg('-a', '--all', dest='all_configurations',
+     help='generate all configurations')
 @arg('-i', '--inputs-override',
      action='append',
      completer=completion.inputs_override_templates)
 @arg('-b', '--manager-blueprint-override',
      action='append',
      completer=completion.manager_blueprint_override_templates)
-def generate(configuration,
+@arg('-j', '--jobs', type=int,
+     help='number of configurations generated in parallel '
+          '(default: number of CPUs)')
+def generate(configurations,
+             all_configurations=False,
              inputs_override=None,
              manager_blueprint_override=None,
-             reset=False):
-    """Generate a configuration."""
-    conf = Configuration(configuration)
+             reset=False,
+             jobs=None):
+    """Generate configurations."""
+    if all_configurations == bool(configurations):
+        raise argh.CommandError('Pass configurations or --all')
     suites_yaml = settings.load_suites_yaml()
-    conf.handler_configuration = _generate_configuration(
-        cmd_inputs_override=inputs_override,
-        cmd_blueprint_override=manager_blueprint_override,
-        conf_obj=conf,
-        conf_key='handler_configurations',
-        conf_name=configuration,
-        conf_additional={'install_manager_blueprint_dependencies': False},
-        conf_blueprint_key='manager_blueprint',
-        blueprint_dir_name='manager-blueprint',
-        blueprint_override_key='manager_blueprint_override',
-        blueprint_override_template_key='manager_blueprint_override_templates',
-        blueprint_path=conf.manager_blueprint_path,
+    names = _match_names(
+        configurations if not all_configurations else ['*'],
+        suites_yaml.get('handler_configurations') or {},
+        'configuration')
+    generate_one = functools.partial(
+        _generate,
+        inputs_override=inputs_override,
+        manager_blueprint_override=manager_blueprint_override,
         reset=reset,
-        properties=None,
-        user_yaml=suites_yaml)
+        suites_yaml=suites_yaml)
+    if len(names) == 1:
+        generate_one(names[0])
+        return
+    errors = parallel.run(generate_one, names, jobs=jobs)
+    failed = [name for name, _ in errors]
+    generated = [name for name in names if name not in failed]
+    # The current configuration is the last one generated, as if they were
+    # generated one after the other
+    if generated:
+        _set_current_configuration(generated[-1])
+    print 'Generated {0} of {1} configurations'.format(len(generated),
+                                                       len(names))
+    if errors:
+        raise argh.CommandError('Failed generating {0} configurations:\n'
+                                '{1}'.format(len(errors), '\n'.join(
+                                    '  {0}: {1}'.format(name, error)
+                                    for name, error in errors)))
+
+
+def _match_names(patterns, existing, kind):
+    names = []
+    for pattern in patterns:
+        if pattern in existing:
+            matches = [pattern]
+        else:
+            matches = sorted(fnmatch.filter(existing, pattern))
+            if not matches and not glob.has_magic(pattern):
+                # Reported as missing when generated
+                matches = [pattern]
+        if not matches:
+            raise argh.CommandError('No {0} matches {1}'.format(kind,
+                                                                pattern))
+        names += [name for name in matches if name not in names]
+    return names
+
+
+def _generate(configuration,
+              inputs_override=None,
+              manager_blueprint_override=None,
+              reset=False,
+              suites_yaml=None):
+    conf = Configuration(configuration)
+    if suites_yaml is None:
+        suites_yaml = settings.load_suites_yaml()
+    else:
+        suites_yaml = copy.deepcopy(suites_yaml)
+    with conf.transaction():
+        conf.handler_configuration = _generate_configuration(
+            cmd_inputs_override=inputs_override,
+            cmd_blueprint_override=manager_blueprint_override,
+            conf_obj=conf,
+            conf_key='handler_configurations',
+            conf_name=configuration,
+            conf_additional={'install_manager_blueprint_dependencies': False},
+            conf_blueprint_key='manager_blueprint',
+            blueprint_dir_name='manager-blueprint',
+            blueprint_override_key='manager_blueprint_override',
+            blueprint_override_template_key=(
+                'manager_blueprint_override_templates'),
+            blueprint_path=conf.manager_blueprint_path,
+            reset=reset,
+            properties=None,
+            user_yaml=suites_yaml)
+    _set_current_configuration(configuration)
+
+
+def _set_current_configuration(configuration):
     with settings.configurations:
         if os.path.islink(CURRENT_CONFIGURATION):
             os.remove(CURRENT_CONFIGURATION)
@@ -119,29 +214,65 @@ def generate(configuration,
 
 @command
 @arg('configuration', completer=completion.existing_configurations)
-@arg('blueprint', completer=completion.all_blueprints)
-def generate_blueprint(configuration, blueprint, reset=False):
-    """Generate a blueprint inside a configuration."""
+@arg('blueprints', nargs='+', completer=completion.all_blueprints,
+     help='blueprint names or glob patterns')
+@arg('-j', '--jobs', type=int,
+     help='number of blueprints generated in parallel '
+          '(default: number of CPUs)')
+def generate_blueprint(configuration, blueprints, reset=False, jobs=None):
+    """Generate blueprints inside a configuration."""
     conf = Configuration(configuration)
     if not conf.exists():
         raise NO_INIT
+    # Resolved once, workers get the parsed documents
     blueprints_yaml = settings.load_blueprints_yaml()
+    properties = conf.properties
+    names = _match_names(blueprints, blueprints_yaml.get('blueprints') or {},
+                         'blueprint')
+    generate_one = functools.partial(_generate_blueprint,
+                                     configuration=configuration,
+                                     reset=reset,
+                                     blueprints_yaml=blueprints_yaml,
+                                     properties=properties)
+    if len(names) == 1:
+        generate_one(names[0])
+        return
+    errors = parallel.run(generate_one, names, jobs=jobs)
+    print 'Generated {0} of {1} blueprints'.format(len(names) - len(errors),
+                                                   len(names))
+    if errors:
+        raise argh.CommandError('Failed generating {0} blueprints:\n'
+                                '{1}'.format(len(errors), '\n'.join(
+                                    '  {0}: {1}'.format(name, error)
+                                    for name, error in errors)))
+
+
+def _generate_blueprint(blueprint, configuration, reset=False,
+                        blueprints_yaml=None, properties=None):
+    conf = Configuration(configuration)
+    if blueprints_yaml is None:
+        blueprints_yaml = settings.load_blueprints_yaml()
+    else:
+        blueprints_yaml = copy.deepcopy(blueprints_yaml)
+    if properties is None:
+        properties = conf.properties
     blueprint = conf.blueprint(blueprint)
-    blueprint.blueprint_configuration = _generate_configuration(
-        cmd_inputs_override=None,
-        cmd_blueprint_override=None,
-        conf_obj=blueprint,
-        conf_key='blueprints',
-        conf_name=blueprint.blueprint_name,
-        conf_additional=None,
-        conf_blueprint_key='blueprint',
-        blueprint_dir_name='blueprint',
-        blueprint_override_key='blueprint_override',
-        blueprint_override_template_key=None,
-        blueprint_path=blueprint.blueprint_path,
-        reset=reset,
-        properties=conf.properties,
-        user_yaml=blueprints_yaml)
+    with conf.transaction():
+        blueprint.blueprint_configuration = _generate_configuration(
+            cmd_inputs_override=None,
+            cmd_blueprint_override=None,
+            conf_obj=blueprint,
+            conf_key='blueprints',
+            conf_name=blueprint.blueprint_name,
+            conf_additional=None,
+            conf_blueprint_key='blueprint',
+            blueprint_dir_name='blueprint',
+            blueprint_override_key='blueprint_override',
+            blueprint_override_template_key=None,
+            blueprint_path=blueprint.blueprint_path,
+            reset=reset,
+            properties=properties,
+            user_yaml=blueprints_yaml)
 
 
 def _generate_configuration(cmd_inputs_override,
@@ -167,60 +298,207 @@ def _generate_configuration(cmd_inputs_override,
                               for key in (cmd_blueprint_override or [])]
     original_inputs_path = os.path.expanduser(conf.get('inputs', ''))
     original_blueprint_path = os.path.expanduser(conf[conf_blueprint_key])
-    if conf_obj.dir.exists():
-        if reset:
-            if conf_obj.dir == os.getcwd():
-                os.chdir(conf_obj.dir.dirname())
-            shutil.rmtree(conf_obj.dir)
-        else:
-            raise ALREADY_INITIALIZED
-    conf_obj.dir.makedirs()
-    if not original_inputs_path:
-        fd, original_inputs_path = tempfile.mkstemp()
-        os.close(fd)
-        with open(original_inputs_path, 'w') as f:
-            f.write('{}')
-    _, tmp_blueprint_path = util.generate_unique_configurations(
-        workdir=conf_obj.dir,
-        original_inputs_path=original_inputs_path,
-        original_manager_blueprint_path=original_blueprint_path,
-        manager_blueprint_dir_name=blueprint_dir_name)
-    shutil.move(tmp_blueprint_path, blueprint_path)
-    conf['inputs'] = str(conf_obj.inputs_path)
-    conf[conf_blueprint_key] = str(blueprint_path)
-    conf.update(conf_additional or {})
     user_yaml['variables'] = user_yaml.get('variables', {})
     user_yaml['variables']['properties'] = properties or {}
     overrides = [
-        (conf_obj.inputs_path, 'inputs_override', cmd_inputs_override),
-        (blueprint_path, blueprint_override_key, cmd_blueprint_override)
+        ('inputs', 'inputs_override', cmd_inputs_override),
+        (conf_blueprint_key, blueprint_override_key, cmd_blueprint_override)
     ]
-    for yaml_path, prop, additional_overrides in overrides:
+
+    generated_dir = conf_obj.dir
+    source_blueprint_dir = os.path.dirname(original_blueprint_path)
+    source_manifest = fingerprint.manifest(source_blueprint_dir)
+    source_manifest.pop(os.path.basename(original_blueprint_path), None)
+    generated = set([blueprint_dir_name,
+                     generated_dir.relpathto(conf_obj.inputs_path),
+                     generated_dir.relpathto(blueprint_path)])
+    generated.update(os.path.join(blueprint_dir_name, rel_path)
+                     for rel_path in source_manifest)
+    generation_fingerprint = _generation_fingerprint(
+        conf=conf,
+        overrides=overrides,
+        conf_additional=conf_additional,
+        variables=user_yaml['variables'],
+        sources=[original_inputs_path, original_blueprint_path],
+        source_manifest=source_manifest,
+        targets=[generated_dir, blueprint_dir_name, blueprint_path])
+
+    if generated_dir.exists():
+        if not reset:
+            raise ALREADY_INITIALIZED
+        up_to_date = fingerprint.is_current(generated_dir,
+                                            generation_fingerprint)
+        fingerprint.remove_unexpected(generated_dir, generated)
+    else:
+        generated_dir.makedirs()
+        up_to_date = False
+    if not up_to_date:
+        fingerprint.sync_tree(source_blueprint_dir,
+                              generated_dir / blueprint_dir_name,
+                              source_manifest)
+        if original_inputs_path:
+            store.copy(original_inputs_path, conf_obj.inputs_path)
+        else:
+            yaml_io.write_file(conf_obj.inputs_path, '{}')
+        store.copy(original_blueprint_path, blueprint_path)
+    if generation_fingerprint:
+        conf_obj.after_commit(lambda: fingerprint.record(
+            generated_dir, generation_fingerprint, generated))
+
+    conf['inputs'] = str(conf_obj.inputs_path)
+    conf[conf_blueprint_key] = str(blueprint_path)
+    conf.update(conf_additional or {})
+    variables = Variables(user_yaml['variables'])
+    for name, prop, additional_overrides in overrides:
         unprocessed = conf.pop(prop, {})
+        if up_to_date:
+            continue
         for additional in additional_overrides:
             unprocessed.update(additional)
-        override = util.process_variables(user_yaml, unprocessed)
-        with patcher.YamlPatcher(yaml_path, default_flow_style=False) as patch:
-            for k, v in override.items():
-                patch.set_value(k, v)
+        override = variables.process(unprocessed)
+        with getattr(conf_obj.patch, name) as patch:
+            patch.apply(override)
     return conf
 
 
+def _generation_fingerprint(conf, overrides, conf_additional, variables,
+                            sources, source_manifest, targets):
+    # Functions in overrides may depend on anything (e.g. the environment),
+    # and sources modified too recently may change unnoticed, so these
+    # are always generated anew
+    override_values = [value
+                       for _, prop, additional_overrides in overrides
+                       for override in [conf.get(prop) or {}] +
+                       additional_overrides
+                       for value in override.values()]
+    if any(isinstance(value, dict) and value.get('func')
+           for value in override_values):
+        return None
+    now = time.time()
+    sources = [[source, cache.mtime(source)] for source in sources]
+    if (fingerprint.is_racy(source_manifest, now) or
+            any(cache.is_racy(mtime, now) for _, mtime in sources)):
+        return None
+    return fingerprint.compute(
+        code=cache.code_fingerprint(),
+        conf=conf,
+        overrides=[additional for _, _, additional in overrides],
+        conf_additional=conf_additional,
+        variables=variables,
+        sources=sources,
+        source_manifest=source_manifest,
+        targets=targets)
+
+
 @command
-@arg('configuration', completer=completion.existing_configurations)
-def status(configuration):
-    """See the status of an environment specified by a configuration."""
-    conf = Configuration(configuration)
-    if not conf.exists():
-        raise NO_INIT
-    manager_ip = conf.handler_configuration.get('manager_ip')
-    if not manager_ip:
-        raise NO_BOOTSTRAP
+@arg('configuration', nargs='?',
+     completer=completion.existing_configurations)
+@arg('-a', '--all', dest='all_configurations')
+@arg('--json', dest='json_output')
+def status(configuration,
+           all_configurations=False,
+           json_output=False,
+           max_age=STATUS_MAX_AGE):
+    """See the status of an environment specified by a configuration (or of
+       all bootstrapped environments)."""
+    if all_configurations == bool(configuration):
+        raise argh.CommandError('Pass a configuration or --all')
+    if not all_configurations:
+        conf = Configuration(configuration)
+        if not conf.exists():
+            raise NO_INIT
+        manager_ip = conf.handler_configuration.get('manager_ip')
+        if not manager_ip:
+            raise NO_BOOTSTRAP
+        result = _probe(configuration)
+        if not result['reachable']:
+            raise argh.CommandError('[{0}] Not reachable'.format(manager_ip))
+        conf.logger.info('[{0}] Running ({1})'.format(manager_ip,
+                                                      result['version']))
+        return
+    results = _fleet_status(max_age)
+    if json_output:
+        print json.dumps(results, indent=2, sort_keys=True)
+        return
+    headers = ['CONFIGURATION', 'MANAGER', 'STATUS', 'VERSION', 'LATENCY']
+    _print_table(headers, [
+        [r['configuration'],
+         r['manager_ip'],
+         'running' if r['reachable'] else 'not reachable',
+         r['version'] or '-',
+         '{0:.0f}ms'.format(r['latency'] * 1000) if r['reachable'] else '-']
+        for r in results])
+
+
+def _fleet_status(max_age):
+    """Status of all bootstrapped configurations, probed concurrently.
+    Statuses up to `max_age` seconds old are served from the cache."""
+    bootstrapped = {}
+    if settings.configurations.isdir():
+        for conf_dir in settings.configurations.dirs():
+            if conf_dir.islink():
+                continue
+            conf = Configuration(conf_dir.basename())
+            if not conf.exists():
+                continue
+            handler_configuration = conf.handler_configuration
+            if handler_configuration.get('manager_ip'):
+                bootstrapped[conf.configuration] = [
+                    handler_configuration['manager_ip'],
+                    handler_configuration.get('manager_port', 80)]
+    cached = cache.load(STATUS_CACHE) or {}
+    now = time.time()
+    results = {}
+    for name, manager in bootstrapped.items():
+        entry = cached.get(name)
+        if (entry and entry['manager'] == manager and
+                0 <= now - entry['result']['checked_at'] <= max_age):
+            results[name] = entry['result']
+    probed = parallel.call_threads(
+        _probe, sorted(set(bootstrapped) - set(results)), jobs=STATUS_JOBS)
+    for name, result, error in probed:
+        if error:
+            result = _status_result(name, bootstrapped[name][0],
+                                    error=error)
+        results[name] = result
+    if probed:
+        cache.store(STATUS_CACHE, dict(
+            (name, {'manager': bootstrapped[name], 'result': result})
+            for name, result in results.items()))
+    return [results[name] for name in sorted(results)]
+
+
+def _probe(configuration):
+    handler_configuration = Configuration(configuration).handler_configuration
+    manager_ip = handler_configuration.get('manager_ip')
+    # Not the (cached) configuration client, for shorter timeouts
+    client = rest_client.Client(
+        manager_ip, handler_configuration.get('manager_port', 80),
+        pool_size=1,
+        connect_timeout=STATUS_CONNECT_TIMEOUT,
+        read_timeout=STATUS_READ_TIMEOUT)
+    start = time.time()
     try:
-        version = conf.client.manager.get_version()['version']
-        conf.logger.info('[{0}] Running ({1})'.format(manager_ip, version))
-    except requests.exceptions.ConnectionError:
-        raise argh.CommandError('[{0}] Not reachable'.format(manager_ip))
+        version = client.manager.get_version()['version']
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as e:
+        return _status_result(configuration, manager_ip,
+                              error='{0}: {1}'.format(type(e).__name__, e))
+    finally:
+        client.close()
+    return _status_result(configuration, manager_ip, version=version,
+                          latency=time.time() - start)
+
+
+def _status_result(configuration, manager_ip, version=None, latency=None,
+                   error=None):
+    return {'configuration': configuration,
+            'manager_ip': manager_ip,
+            'reachable': error is None,
+            'version': version,
+            'latency': latency,
+            'error': error,
+            'checked_at': time.time()}
 
 
 @command
@@ -238,10 +516,10 @@ def bootstrap(configuration,
     """Bootstrap a configuration based environment."""
     conf = Configuration(configuration)
     if not conf.exists() or reset:
-        generate(configuration=configuration,
-                 inputs_override=inputs_override,
-                 manager_blueprint_override=manager_blueprint_override,
-                 reset=reset)
+        _generate(configuration=configuration,
+                  inputs_override=inputs_override,
+                  manager_blueprint_override=manager_blueprint_override,
+                  reset=reset)
     with conf.dir:
         cfy.init(conf)
         cfy.bootstrap(blueprint_path=conf.manager_blueprint_path,
@@ -267,31 +545,113 @@ def teardown(configuration):
 
 @command
 @arg('configuration', completer=completion.existing_configurations)
-@arg('blueprint', completer=completion.all_blueprints)
-def deploy(configuration, blueprint,
+@arg('blueprints', nargs='+', completer=completion.all_blueprints)
+@arg('-j', '--jobs', type=int)
+def deploy(configuration, blueprints,
            skip_generation=False,
            reset=False,
-           timeout=1800):
-    """Deploy (upload, create deployment and install) a blueprint
+           timeout=1800,
+           jobs=None):
+    """Deploy (upload, create deployment and install) blueprints
        in a configuration based environment."""
     conf = Configuration(configuration)
     if not conf.dir.isdir():
         raise NO_INIT
+    if skip_generation:
+        blueprints_yaml = properties = None
+        existing = ([d.basename() for d in conf.blueprints_dir.dirs()]
+                    if conf.blueprints_dir.isdir() else [])
+    else:
+        # Resolved once, workers get the parsed documents
+        blueprints_yaml = settings.load_blueprints_yaml()
+        properties = conf.properties
+        existing = blueprints_yaml.get('blueprints') or {}
+    names = _match_names(blueprints, existing, 'blueprint')
+    deploy_one = functools.partial(_deploy,
+                                   configuration=configuration,
+                                   skip_generation=skip_generation,
+                                   reset=reset,
+                                   deadline=time.time() + timeout,
+                                   blueprints_yaml=blueprints_yaml,
+                                   properties=properties)
+    if len(names) == 1:
+        deploy_one(names[0])
+        return
+    results = parallel.call_all(functools.partial(_deploy_logged, deploy_one,
+                                                  conf.logs_dir),
+                                names, jobs=jobs)
+    errors = [(name, error) for name, _, error in results if error]
+    _print_table(['BLUEPRINT', 'RESULT', 'DURATION', 'LOG'], [
+        [name,
+         'failed' if error else 'deployed',
+         '{0:.0f}s'.format(duration) if duration is not None else '-',
+         _deploy_log_path(conf.logs_dir, name)]
+        for name, duration, error in results])
+    print 'Deployed {0} of {1} blueprints'.format(len(names) - len(errors),
+                                                  len(names))
+    if errors:
+        raise argh.CommandError('Failed deploying {0} blueprints:\n'
+                                '{1}'.format(len(errors), '\n'.join(
+                                    '  {0}: {1}'.format(name, error)
+                                    for name, error in errors)))
+
+
+def _deploy(blueprint, configuration, skip_generation, reset, deadline,
+            blueprints_yaml=None, properties=None):
+    conf = Configuration(configuration)
     bp = conf.blueprint(blueprint)
     if not skip_generation:
-        generate_blueprint(configuration=configuration,
-                           blueprint=blueprint,
-                           reset=reset)
+        _generate_blueprint(blueprint,
+                            configuration=configuration,
+                            reset=reset,
+                            blueprints_yaml=blueprints_yaml,
+                            properties=properties)
+    backend = _backend(conf)
     with conf.dir:
-        cfy.blueprints_upload(blueprint_path=bp.blueprint_path,
-                              blueprint_id=blueprint)
-        cfy.deployments_create(blueprint_id=blueprint,
-                               deployment_id=blueprint,
-                               inputs=bp.inputs_path)
-        cfy.executions_start(workflow='install',
-                             deployment_id=blueprint,
-                             include_logs=True,
-                             timeout=timeout)
+        backend.blueprints_upload(blueprint_path=bp.blueprint_path,
+                                  blueprint_id=blueprint)
+        backend.deployments_create(blueprint_id=blueprint,
+                                   deployment_id=blueprint,
+                                   inputs=bp.inputs_path)
+        timeout = int(deadline - time.time())
+        if timeout <= 0:
+            raise argh.CommandError('Timed out before installing {0}'
+                                    .format(blueprint))
+        backend.executions_start(workflow='install',
+                                 deployment_id=blueprint,
+                                 include_logs=True,
+                                 timeout=timeout)
+
+
+def _deploy_logged(deploy_one, logs_dir, blueprint):
+    start = time.time()
+    log_path = _deploy_log_path(logs_dir, blueprint)
+    with logs.redirect_output(log_path, prefix='[{0}] '.format(blueprint)):
+        try:
+            deploy_one(blueprint)
+        except argh.CommandError as e:
+            sys.stderr.write('error: {0}\n'.format(e))
+            raise
+        except Exception as e:
+            # The full error goes to the log, the summary gets its gist
+            traceback.print_exc()
+            gist = next((line.strip() for line in str(e).splitlines()
+                         if line.strip()), '')
+            raise argh.CommandError('{0}: {1} (see {2})'.format(
+                type(e).__name__, gist, log_path))
+    return time.time() - start
+
+
+def _deploy_log_path(logs_dir, blueprint):
+    return logs_dir / 'deploy-{0}.log'.format(blueprint)
+
+
+def _print_table(headers, rows):
+    rows = [headers] + [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(headers))]
+    for row in rows:
+        print '  '.join(cell.ljust(width)
+                        for cell, width in zip(row, widths)).rstrip()
 
 
 @command
@@ -305,16 +665,20 @@ def undeploy(configuration, blueprint, cancel_executions=False):
 
 @command
 @arg('configuration', completer=completion.existing_configurations)
-def cleanup_deployments(configuration, cancel_executions=False):
+@arg('-j', '--jobs', type=int)
+def cleanup_deployments(configuration, cancel_executions=False,
+                        jobs=parallel.DEFAULT_THREADS):
     """Uninstall and delete all deployments and blueprints in an
        environment."""
-    _cleanup_deployments(configuration, cancel_executions)
+    _cleanup_deployments(configuration, cancel_executions, jobs=jobs)
 
 
-def _cleanup_deployments(configuration, cancel_executions, blueprint=None):
+def _cleanup_deployments(configuration, cancel_executions, blueprint=None,
+                         jobs=parallel.DEFAULT_THREADS):
     conf = Configuration(configuration)
     if not conf.dir.isdir():
         raise NO_INIT
+    backend = _backend(conf)
     with conf.dir:
         _wait_for_executions(conf, blueprint, cancel_executions)
         if blueprint:
@@ -324,56 +688,99 @@ def _cleanup_deployments(configuration, cancel_executions, blueprint=None):
                            conf.client.deployments.list(_include=['id'])]
             blueprints = [b.id for b in
                           conf.client.blueprints.list(_include=['id'])]
-        _wait_for_executions(conf, blueprint, cancel_executions)
-        for deployment_id in deployments:
+
+        # Threads share stdout, so with several deployments, the output of
+        # each one's cfy operations is prefixed with its name
+        prefixed = len(deployments) > 1 or len(blueprints) > 1
+
+        def cleanup_deployment(deployment_id):
             try:
-                cfy.executions_start(workflow='uninstall',
-                                     deployment_id=deployment_id,
-                                     include_logs=True,
-                                     timeout=1800)
-                _wait_for_executions(conf, deployment_id,
-                                     cancel_executions)
-                cfy.deployments_delete(deployment_id=deployment_id,
-                                       ignore_live_nodes=True)
+                with _prefixed_output(deployment_id, prefixed):
+                    backend.executions_start(workflow='uninstall',
+                                             deployment_id=deployment_id,
+                                             include_logs=True,
+                                             timeout=1800)
+                    _wait_for_executions(conf, deployment_id,
+                                         cancel_executions)
+                    backend.deployments_delete(deployment_id=deployment_id,
+                                               ignore_live_nodes=True)
             except Exception as e:
-                conf.logger.warn('Failed cleaning deployment: {0} [1]'.format(
-                    deployment_id, e))
-        for blueprint_id in blueprints:
+                conf.logger.warn('Failed cleaning deployment: {0} [{1}]'
+                                 .format(deployment_id, e))
+                raise
+
+        def cleanup_blueprint(blueprint_id):
             try:
-                cfy.blueprints_delete(blueprint_id=blueprint_id)
+                with _prefixed_output(blueprint_id, prefixed):
+                    backend.blueprints_delete(blueprint_id=blueprint_id)
             except Exception as e:
-                conf.logger.warn('Failed cleaning blueprint: {0} [1]'.format(
-                    blueprint_id, e))
+                conf.logger.warn('Failed cleaning blueprint: {0} [{1}]'
+                                 .format(blueprint_id, e))
+                raise
+
+        # A deployment is cleaned after the deployments that depend on it
+        results = parallel.call_ordered(
+            cleanup_deployment, deployments,
+            after=_deployment_dependents(conf),
+            jobs=jobs)
+        results = [('deployment', deployment_id, error)
+                   for deployment_id, _, error in results]
+        results += [('blueprint', blueprint_id, error)
+                    for blueprint_id, _, error in parallel.call_threads(
+                        cleanup_blueprint, blueprints, jobs=jobs)]
+    errors = [(kind, name, error) for kind, name, error in results if error]
+    if errors:
+        raise argh.CommandError(
+            'Failed cleaning {0} of {1} deployments and blueprints:\n'
+            '{2}'.format(len(errors), len(results), '\n'.join(
+                '  {0} {1}: {2}'.format(kind, name, error)
+                for kind, name, error in errors)))
+
+
+def _deployment_dependents(conf):
+    """deployment -> deployments that depend on it, for managers that track
+    inter deployment dependencies (none otherwise)."""
+    dependents = {}
+    inter_deployment_dependencies = getattr(
+        conf.client, 'inter_deployment_dependencies', None)
+    if inter_deployment_dependencies:
+        for dependency in inter_deployment_dependencies.list():
+            dependents.setdefault(dependency['target_deployment_id'],
+                                  set()).add(
+                dependency['source_deployment_id'])
+    return dependents
+
+
+@contextmanager
+def _prefixed_output(name, prefixed=True):
+    """Prefix the output of `cfy` operations run by the current thread with
+    `name`."""
+    if not prefixed:
+        yield
+        return
+    prefix = '[{0}] '.format(name)
+    stdout = logs.PrefixedWriter(sys.stdout, prefix)
+    stderr = logs.PrefixedWriter(sys.stderr, prefix)
+    try:
+        with runner.output(stdout, stderr):
+            yield
+    finally:
+        stdout.close()
+        stderr.close()
+
+
+def _backend(conf):
+    """Post bootstrap operations, through the REST client or (with
+    `backend: cli` in the claw settings) the `cfy` CLI."""
+    if settings.backend == CLI_BACKEND:
+        return cfy
+    return rest.Backend(conf)
 
 
 def _wait_for_executions(conf, deployment_id, cancel_executions):
-    client = conf.client
-    executions = client.executions.list(deployment_id,
-                                        include_system_workflows=True)
-    for e in executions:
-        if e.status in e.END_STATES:
-            if (cancel_executions and
-                    e.workflow_id == 'create_deployment_environment'):
-                conf.client.executions.update(e.id, status=e.TERMINATED)
-            continue
-        if e.workflow_id != STOP_DEPLOYMENT_ENVIRONMENT and cancel_executions:
-            client.executions.cancel(e.id)
-        cancel_timeout = time.time() + 10
-        while e.status not in e.END_STATES and time.time() < cancel_timeout:
-            conf.logger.info('Waiting for execution {0}[{1}] to end. '
-                             'Current status is {2}'.format(e.id,
-                                                            e.workflow_id,
-                                                            e.status))
-            time.sleep(1)
-            e = client.executions.get(e.id)
-        if cancel_executions and e.status not in e.END_STATES:
-            if e.workflow_id == 'create_deployment_environment':
-                new_status = e.TERMINATED
-            else:
-                new_status = e.CANCELLED
-            conf.logger.info('Execution did not reach a final state. '
-                             'Manually setting status: {0}'.format(new_status))
-            client.executions.update(e.id, status=new_status)
+    executions.wait(conf.client, deployment_id,
+                    cancel=cancel_executions,
+                    logger=conf.logger)
 
 
 @command
@@ -392,9 +799,9 @@ def cleanup(configuration,
     temp_configuration = False
     if not conf.exists():
         temp_configuration = True
-        generate(configuration,
-                 inputs_override=inputs_override,
-                 manager_blueprint_override=manager_blueprint_override)
+        _generate(configuration,
+                  inputs_override=inputs_override,
+                  manager_blueprint_override=manager_blueprint_override)
     if not temp_configuration and (inputs_override or
                                    manager_blueprint_override):
         conf.logger.warn('Inputs override or manager blueprints override '
@@ -434,7 +841,7 @@ def script(configuration, script_path, script_args):
         else:
             raise argh.CommandError('Could not locate {0}'.format(script_path))
     exec_globs = exec_env.exec_globals(script_path)
-    execfile(script_path, exec_globs)
+    exec code_cache.compile_script(script_path) in exec_globs
     if script_args and script_args[0] in exec_globs:
         func = script_args[0]
         script_args = script_args[1:]
@@ -455,8 +862,9 @@ def add_script_based_commands():
     names = {getattr(f, argh.decorators.ATTR_NAME,
                      f.__name__.replace('_', '-')) for f in app.commands}
 
-    def _gen_func(script_path):
-        name = script_path.basename()[:-len('.py')].replace('_', '-')
+    def _gen_func(entry):
+        name = entry['name']
+        script_path = path(entry['path'])
         if name in names:
             raise argh.CommandError('Name conflict: Found two commands named '
                                     '"{0}".'.format(name))
@@ -466,12 +874,21 @@ def add_script_based_commands():
         @arg('script_args', nargs='...')
         @argh.named(name)
         def func(configuration, script_args):
-            """Script based command."""
             return script(configuration, script_path, script_args)
+        func.__doc__ = _script_command_doc(entry)
         return func
-    for scripts_dir in settings.scripts:
-        for script_file in scripts_dir.files('*.py'):
-            _gen_func(script_file)
+    for entry in script_index.scripts():
+        _gen_func(entry)
+
+
+def _script_command_doc(entry):
+    doc = (entry['doc'] or 'Script based command.').strip()
+    functions = entry['functions']
+    if functions:
+        doc = '{0}\n\nFunctions: {1}'.format(doc, ', '.join(
+            '{0}({1})'.format(name, functions[name])
+            for name in sorted(functions)))
+    return doc
 
 
 @command
@@ -485,6 +902,14 @@ def generate_script(script_path, reset=False, plain=False):
     os.chmod(script_path, os.stat(script_path).st_mode | 0o111)
 
 
+@command
+def gc():
+    """Remove blueprint files no configuration uses from the store."""
+    removed, reclaimed = store.collect()
+    print 'Removed {0} files ({1:.1f} MB)'.format(removed,
+                                                  reclaimed / 1024.0 ** 2)
+
+
 @command
 def cdconfiguration():
     """Output bash function and completion for cdconfiguration."""
@@ -494,3 +919,10 @@ def cdconfiguration():
         'templates/cdconfiguration.template.sh')
     sys.stdout.write(cdconfiguration_template.replace('{{configurations}}',
                                                       settings.configurations))
+
+
+@command
+def daemon(socket_path=None, idle_timeout=claw_daemon.DEFAULT_IDLE_TIMEOUT):
+    """Run a resident claw process that serves claw-client calls."""
+    socket_path = os.path.abspath(socket_path or claw_daemon.socket_path())
+    claw_daemon.start(socket_path=socket_path, idle_timeout=idle_timeout)
@@ -14,31 +14,37 @@
 # limitations under the License.
 ############
 
+import argparse
+import locale
+import os
+import time
+
+import argcomplete
+import argh.utils
+
+from claw import cache
 from claw.settings import settings
 from claw.configuration import Configuration
 
+CACHE_NAME = 'completion.json'
+
 
 class Completion(object):
 
-    @staticmethod
-    def _configurations():
-        return settings.load_suites_yaml(variables=False)[
-            'handler_configurations'].keys()
+    def __init__(self):
+        self._index = None
 
-    @staticmethod
-    def _blueprints():
-        return settings.load_blueprints_yaml(variables=False)[
-            'blueprints'].keys()
+    def _configurations(self):
+        return self._get_index()['configurations']
 
-    @staticmethod
-    def _inputs_override_templates():
-        return settings.load_suites_yaml(variables=False)[
-            'inputs_override_templates']
+    def _blueprints(self):
+        return self._get_index()['blueprints']
 
-    @staticmethod
-    def _manager_blueprint_override_templates():
-        return settings.load_suites_yaml(variables=False)[
-            'manager_blueprint_override_templates']
+    def _inputs_override_templates(self):
+        return self._get_index()['inputs_override_templates']
+
+    def _manager_blueprint_override_templates(self):
+        return self._get_index()['manager_blueprint_override_templates']
 
     def all_blueprints(self, prefix, **kwargs):
         return (b for b in self._blueprints()
@@ -54,8 +60,9 @@ class Completion(object):
                 if (conf.blueprints_dir / b).exists())
 
     def existing_configurations(self, prefix, **kwargs):
+        existing = set(self._get_index()['existing_configurations'])
         return (c for c in self.all_configurations(prefix)
-                if (settings.configurations / c).exists())
+                if c in existing)
 
     def inputs_override_templates(self, prefix, **kwargs):
         return (io for io in self._inputs_override_templates()
@@ -65,13 +72,163 @@ class Completion(object):
         return (mbo for mbo in self._manager_blueprint_override_templates()
                 if mbo.startswith(prefix))
 
+    def script_paths(self, prefix, **kwargs):
+        for basename in self._get_index()['script_files']:
+            if basename.startswith(prefix):
+                if basename.endswith('.py'):
+                    basename = basename[:-len('.py')]
+                yield basename
+
+    def update_cache(self, parser):
+        """Store the completion index along with the commands of `parser`
+        so following completion requests can skip building the parser."""
+        index = self._get_index()
+        index['parser'] = self._parser_spec(parser)
+        cache.store(CACHE_NAME, index)
+
+    def complete_from_cache(self):
+        """Answer the current argcomplete request from the completion cache.
+
+        Returns False (without writing anything) when the cache is stale or
+        the command line is not one the cache can answer exactly, in which
+        case completion should go through argcomplete and the full parser.
+        """
+        if (os.environ.get('_ARGCOMPLETE_DFS') or
+                not settings.settings_path.exists()):
+            return False
+        index = cache.load(CACHE_NAME)
+        if (not index or 'parser' not in index or index['racy'] or
+                index['key'] != self._cache_key()):
+            return False
+        self._index = index
+        cword_prequote, cword_prefix, _, comp_words, last_wordbreak_pos = (
+            argcomplete.split_line(os.environ['COMP_LINE'],
+                                   int(os.environ['COMP_POINT'])))
+        args = comp_words[int(os.environ['_ARGCOMPLETE']):]
+        completions = self._cached_completions(index['parser'], args,
+                                               cword_prefix)
+        if completions is None:
+            return False
+        finder = argcomplete.CompletionFinder()
+        completions = finder.filter_completions(completions)
+        completions = finder.quote_completions(completions, cword_prequote,
+                                               last_wordbreak_pos)
+        ifs = os.environ.get('_ARGCOMPLETE_IFS', '\013')
+        with os.fdopen(8, 'wb') as output:
+            output.write(ifs.join(completions).encode(
+                locale.getpreferredencoding()))
+        return True
+
+    def _cached_completions(self, spec, args, prefix):
+        # Only simple command lines (no options typed yet, single word
+        # positionals, except for a last `*` or `+` one that takes the rest)
+        # are answered from the cache
+        if (any(arg.startswith('-') for arg in args) or
+                (prefix.startswith('-') and '=' in prefix)):
+            return None
+        is_option = prefix.startswith('-')
+        if not args:
+            return [c for c in spec['options'] +
+                    [name for name, _ in spec['commands']]
+                    if c.startswith(prefix)]
+        command = dict(spec['commands']).get(args[0])
+        if not command:
+            return None
+        values = args[1:]
+        positionals = command['positionals']
+        repeated = bool(positionals) and positionals[-1][2] in ('*', '+')
+        single = positionals[:-1] if repeated else positionals
+        if any(nargs is not None for _, _, nargs in single):
+            return None
+        if len(values) > len(positionals) and not repeated:
+            return None
+        completions = [o for o in command['options'] if o.startswith(prefix)]
+        if is_option or (len(values) == len(positionals) and not repeated):
+            return completions
+        dest, completer, _ = positionals[min(len(values),
+                                             len(positionals) - 1)]
+        if not completer:
+            return None
+        parsed_args = dict((d, v) for (d, _, _), v in zip(single, values))
+        if repeated:
+            parsed_args[dest] = values[len(single):]
+        parsed_args = argparse.Namespace(**parsed_args)
+        completions += [c for c in getattr(self, completer)(
+            prefix=prefix, parsed_args=parsed_args) if c.startswith(prefix)]
+        return completions
+
+    def _parser_spec(self, parser):
+        def options(p):
+            return [o for action in p._actions
+                    if action.option_strings and
+                    action.help != argparse.SUPPRESS
+                    for o in action.option_strings]
+
+        def completer_name(action):
+            completer = getattr(action, 'completer', None)
+            name = getattr(completer, '__name__', None)
+            if name and getattr(self, name, None) == completer:
+                return name
+            return None
+        subparsers = argh.utils.get_subparsers(parser)
+        return {
+            'options': options(parser),
+            'commands': [
+                [name, {
+                    'options': options(subparser),
+                    'positionals': [
+                        [action.dest, completer_name(action), action.nargs]
+                        for action in subparser._get_positional_actions()]
+                }] for name, subparser in subparsers.choices.items()]
+        }
+
+    def _get_index(self):
+        if self._index is None:
+            key = self._cache_key()
+            index = cache.load(CACHE_NAME)
+            if not index or index['racy'] or index['key'] != key:
+                index = self._build_index(key)
+            self._index = index
+        return self._index
+
+    @staticmethod
+    def _build_index(key):
+        suites_yaml = settings.load_suites_yaml(variables=False) or {}
+        blueprints_yaml = settings.load_blueprints_yaml(variables=False) or {}
+        configurations = settings.configurations
+        script_files = []
+        for scripts_dir in settings.scripts:
+            script_files += [f.basename() for f in scripts_dir.files()]
+        now = time.time()
+        racy = any(cache.is_racy(mtime, now) for mtime in (
+            [key['settings'], key['suites_yaml'], key['blueprints_yaml'],
+             key['configurations']] + key['scripts']))
+        return {
+            'key': key,
+            'racy': racy,
+            'configurations': list(
+                suites_yaml.get('handler_configurations') or {}),
+            'inputs_override_templates': list(
+                suites_yaml.get('inputs_override_templates') or {}),
+            'manager_blueprint_override_templates': list(
+                suites_yaml.get('manager_blueprint_override_templates') or
+                {}),
+            'blueprints': list(blueprints_yaml.get('blueprints') or {}),
+            'existing_configurations': (os.listdir(configurations)
+                                        if configurations.isdir() else []),
+            'script_files': script_files
+        }
+
     @staticmethod
-    def script_paths(prefix, **kwargs):
-        for script_dir in settings.scripts:
-            for script_path in script_dir.files():
-                basename = script_path.basename()
-                if basename.startswith(prefix):
-                    if basename.endswith('.py'):
-                        basename = basename[:-len('.py')]
-                    yield basename
+    def _cache_key():
+        return {
+            'code': cache.code_fingerprint(),
+            'settings': cache.mtime(settings.settings_path),
+            'suites_yaml': cache.mtime(settings.user_suites_yaml),
+            'blueprints_yaml': cache.mtime(settings.blueprints_yaml),
+            'configurations': cache.mtime(settings.configurations),
+            'scripts': [cache.mtime(d) for d in settings.scripts]
+        }
+
+
 completion = Completion()
@@ -14,22 +14,22 @@
 # limitations under the License.
 ############
 
+import cPickle
 import sys
 import os
 import logging
 import importlib
 from contextlib import contextmanager
 
-import fabric
-import fabric.context_managers
-import fabric.api
-import yaml
-
-import cloudify_rest_client
-from cosmo_tester.framework import util
-
-from claw import patcher
+from claw import cache
+from claw import yaml_io
+from claw.lazy import lazy_import
 from claw.settings import settings
+from claw.variables import Variables
+
+fabric_context_managers = lazy_import('fabric.context_managers')
+rest_client = lazy_import('claw.rest_client')
+patcher = lazy_import('claw.patcher')
 
 CURRENT_CONFIGURATION = '_'
 
@@ -43,6 +43,7 @@ class Configuration(object):
         if configuration == CURRENT_CONFIGURATION and self.exists():
             self.configuration = os.path.basename(os.path.realpath(self.dir))
         self._logger = None
+        self._transaction = None
 
     def exists(self):
         return self.inputs_path.exists()
@@ -59,6 +60,10 @@ class Configuration(object):
     def blueprints_dir(self):
         return self.dir / 'blueprints'
 
+    @property
+    def logs_dir(self):
+        return self.dir / 'logs'
+
     @property
     def inputs_path(self):
         return self.dir / 'inputs.yaml'
@@ -113,17 +118,42 @@ class Configuration(object):
         properties_name = handler_configuration.get('properties')
         if not properties_name:
             return {}
-        suites_yaml = self.load(settings.main_suites_yaml)
+        # Resolved properties only depend on main suites.yaml, so they are
+        # cached until it changes
+        main_suites_yaml_path = settings.main_suites_yaml
+        stat = os.stat(main_suites_yaml_path)
+        key = [properties_name, main_suites_yaml_path,
+               stat.st_mtime, stat.st_size]
+        # Pickled (like yaml_io documents), so a cache hit returns the same
+        # types a miss does
+        cache_name = 'properties-{0}.pickle'.format(self.configuration)
+        data = cache.read(cache_name)
+        if data:
+            try:
+                cached_key, properties = cPickle.loads(data)
+                if cached_key == key:
+                    return properties
+            except Exception:
+                pass
+        suites_yaml = yaml_io.load_file(main_suites_yaml_path) or {}
         handler_properties = suites_yaml.get('handler_properties', {})
         properties = handler_properties.get(properties_name, {})
-        return util.process_variables(suites_yaml, properties)
+        properties = Variables(suites_yaml.get('variables')).process(
+            properties)
+        if not cache.is_racy(stat.st_mtime):
+            try:
+                data = cPickle.dumps((key, properties),
+                                     cPickle.HIGHEST_PROTOCOL)
+            except (cPickle.PicklingError, TypeError):
+                data = None
+            if data:
+                cache.write(cache_name, data)
+        return properties
 
     @property
     def client(self):
-        handler_configuration = self.handler_configuration
-        manager_ip = handler_configuration.get('manager_ip', 'localhost')
-        manager_port = handler_configuration.get('manager_port', 80)
-        return cloudify_rest_client.CloudifyClient(manager_ip, manager_port)
+        return rest_client.get(self.configuration,
+                               self.handler_configuration)
 
     @property
     def claw_handler(self):
@@ -138,11 +168,11 @@ class Configuration(object):
 
     @contextmanager
     def ssh(self):
-        with fabric.context_managers.settings(
+        with fabric_context_managers.settings(
                 host_string=self.handler_configuration.get('manager_ip'),
                 user=self.handler_configuration.get('manager_user'),
                 key_filename=self.handler_configuration.get('manager_key')):
-            yield fabric.api
+            yield importlib.import_module('fabric.api')
 
     @property
     def logger(self):
@@ -162,13 +192,46 @@ class Configuration(object):
     def blueprint(self, blueprint):
         return Blueprint(blueprint, self)
 
-    @staticmethod
-    def load(obj_path):
-        return yaml.load(obj_path.text()) or {}
-
-    @staticmethod
-    def dump(obj, obj_path):
-        obj_path.write_text(yaml.safe_dump(obj, default_flow_style=False))
+    @contextmanager
+    def transaction(self):
+        """Batch the yaml file writes of this configuration and its
+        blueprints.
+
+        Within the block, `patch` and the yaml file properties work on
+        documents held in memory. Each modified file is then written once
+        (atomically) when the block exits without an error, and not at all
+        otherwise.
+        """
+        if self._transaction:
+            yield self
+            return
+        self._transaction = patcher.YamlTransaction()
+        try:
+            yield self
+            self._transaction.commit()
+        finally:
+            self._transaction = None
+
+    def after_commit(self, callback):
+        """Call `callback` once the current transaction commits (now if
+        there is none)."""
+        if self._transaction:
+            self._transaction.after_commit(callback)
+        else:
+            callback()
+
+    def load(self, obj_path):
+        if self._transaction:
+            obj = self._transaction.get(obj_path)
+            if obj is not None:
+                return obj
+        return yaml_io.load_file(obj_path) or {}
+
+    def dump(self, obj, obj_path):
+        if self._transaction:
+            self._transaction.set(obj_path, obj)
+        else:
+            yaml_io.dump_file(obj, obj_path, default_flow_style=False)
 
 
 class Blueprint(object):
@@ -224,14 +287,26 @@ class Blueprint(object):
     def patch(self):
         return ConfigurationPatcher(self)
 
+    def transaction(self):
+        return self.configuration.transaction()
+
+    def after_commit(self, callback):
+        self.configuration.after_commit(callback)
+
 
 class ConfigurationPatcher(object):
 
     def __init__(self, obj):
         self.obj = obj
+        self.configuration = (obj if isinstance(obj, Configuration) else
+                              obj.configuration)
 
     @contextmanager
     def __getattr__(self, item):
         path = getattr(self.obj, '{0}_path'.format(item))
-        with patcher.YamlPatcher(path, default_flow_style=False) as patch:
-            yield patch
+        transaction = self.configuration._transaction
+        if transaction:
+            yield transaction.patcher(path)
+        else:
+            with patcher.YamlPatcher(path, default_flow_style=False) as patch:
+                yield patch
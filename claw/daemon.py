@@ -0,0 +1,433 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""A resident claw interpreter and the thin client that talks to it.
+
+The daemon imports claw and its heavy dependencies once and then listens on a
+unix socket. For every request it forks a session process which forks the
+worker that actually runs claw (with the argv, env and cwd of the client).
+The session relays the worker's stdio to the client as framed messages and
+reports its exit code.
+
+This module is imported by the client, so it should only import the standard
+library at module level.
+"""
+
+import collections
+import errno
+import json
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import time
+import traceback
+
+from claw.lazy import lazy_import
+
+cache = lazy_import('claw.cache')
+
+SOCKET_PATH_ENV = 'CLAW_DAEMON_SOCKET'
+DEFAULT_SOCKET_PATH = '~/.claw-daemon.sock'
+DEFAULT_IDLE_TIMEOUT = 3600
+TICK = 1
+BUFSIZE = 64 * 1024
+
+PRELOAD_MODULES = [
+    'yaml',
+    'requests',
+    'fabric.api',
+    'cloudify_rest_client',
+    'cosmo_tester.framework.util',
+    'claw.main',
+    'claw.commands',
+    'claw.cfy',
+    'claw.runner',
+    'claw.rest',
+    'claw.rest_client',
+    'claw.patcher',
+]
+
+# Frame channels
+REQUEST = 'r'
+STARTED = 's'
+STDIN = '0'
+STDOUT = '1'
+STDERR = '2'
+EXIT = 'x'
+
+FRAME_HEADER = struct.Struct('!cI')
+
+
+def socket_path():
+    return os.path.expanduser(os.environ.get(SOCKET_PATH_ENV,
+                                             DEFAULT_SOCKET_PATH))
+
+
+def client_main():
+    """Entry point of the `claw-client` console script."""
+    sys.exit(run_client(sys.argv[1:]))
+
+
+def run_client(args):
+    """Run claw with `args` through the daemon and return its exit code.
+
+    If no daemon is listening (or it goes away before starting the request)
+    claw is run in the current process instead.
+    """
+    try:
+        request = json.dumps({'argv': args,
+                              'env': dict(os.environ),
+                              'cwd': os.getcwd()})
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path())
+    except (socket.error, OSError, UnicodeDecodeError):
+        return _run_locally(args)
+    try:
+        _send(sock, REQUEST, request)
+        return _relay_client(sock)
+    except _NotStarted:
+        return _run_locally(args)
+    except KeyboardInterrupt:
+        return 128 + signal.SIGINT
+    finally:
+        sock.close()
+
+
+def start(socket_path, idle_timeout):
+    """Replace the current process with a fresh daemon process.
+
+    The daemon runs in a pristine interpreter so that nothing the `claw
+    daemon` command itself loaded (settings, script based commands) leaks into
+    the requests it serves.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execv(sys.executable, [sys.executable, '-m', 'claw.daemon',
+                              socket_path, str(idle_timeout)])
+
+
+def serve(socket_path, idle_timeout):
+    for module in PRELOAD_MODULES:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    fingerprint = cache.code_fingerprint()
+    listener = _listen(socket_path)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    sessions = set()
+    last_activity = time.time()
+    try:
+        while True:
+            readable, _, _ = _select([listener], [], [], TICK)
+            sessions -= _reap()
+            now = time.time()
+            if sessions:
+                last_activity = now
+            if cache.code_fingerprint() != fingerprint:
+                break
+            if readable:
+                conn, _ = listener.accept()
+                sessions.add(_fork_session(conn, listener))
+                conn.close()
+                last_activity = now
+            elif idle_timeout and now - last_activity > idle_timeout:
+                return
+    finally:
+        listener.close()
+        _unlink(socket_path)
+    # claw's code changed, restart so new requests run the new code. Running
+    # sessions are not affected.
+    start(socket_path, idle_timeout)
+
+
+def _listen(socket_path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except socket.error:
+        _unlink(socket_path)
+    else:
+        sys.exit('error: A claw daemon is already listening on {0}'
+                 .format(socket_path))
+    finally:
+        probe.close()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Requests run with the privileges of the daemon, so only its user may
+    # connect
+    umask = os.umask(0o077)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(umask)
+    listener.listen(16)
+    return listener
+
+
+def _fork_session(conn, listener):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 1
+    try:
+        listener.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _serve_session(conn)
+        code = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(code)
+
+
+def _serve_session(conn):
+    reader = _FrameReader(conn)
+    channel, data = reader.next_frame()
+    if channel != REQUEST:
+        return
+    request = json.loads(data)
+    _send(conn, STARTED)
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    pid = os.fork()
+    if not pid:
+        code = 1
+        try:
+            conn.close()
+            for fd in (stdin_w, stdout_r, stderr_r):
+                os.close(fd)
+            for fd, target in ((stdin_r, 0), (stdout_w, 1), (stderr_w, 2)):
+                if fd != target:
+                    os.dup2(fd, target)
+                    os.close(fd)
+            code = _run_request(request)
+        finally:
+            os._exit(code)
+    for fd in (stdin_r, stdout_w, stderr_w):
+        os.close(fd)
+    outputs = {stdout_r: STDOUT, stderr_r: STDERR}
+    while outputs:
+        while reader.frames and stdin_w is not None:
+            _, data = reader.frames.popleft()
+            stdin_w = _write_stdin(stdin_w, data)
+        readable, _, _ = _select([conn] + list(outputs), [], [])
+        for fd in readable:
+            if fd is conn:
+                if not reader.read():
+                    # The client went away, interrupt the worker (and any
+                    # process it started)
+                    _killpg(pid, signal.SIGINT)
+                    return
+            else:
+                data = os.read(fd, BUFSIZE)
+                if data:
+                    _send(conn, outputs[fd], data)
+                else:
+                    os.close(fd)
+                    del outputs[fd]
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        code = 128 + os.WTERMSIG(status)
+    else:
+        code = os.WEXITSTATUS(status)
+    _send(conn, EXIT, str(code))
+
+
+def _run_request(request):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Own process group so that the session can interrupt the worker along
+    # with the processes (e.g. cfy) it started
+    os.setpgid(0, 0)
+    os.environ.clear()
+    os.environ.update((k.encode('utf-8'), v.encode('utf-8'))
+                      for k, v in request['env'].items())
+    os.chdir(request['cwd'])
+    sys.argv = ['claw'] + [a.encode('utf-8') for a in request['argv']]
+    from claw import main
+    try:
+        main.main()
+        code = 0
+    except SystemExit as e:
+        code = _exit_code(e)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
+
+
+def _run_locally(args):
+    from claw import main
+    sys.argv = ['claw'] + list(args)
+    try:
+        main.main()
+    except SystemExit as e:
+        return _exit_code(e)
+    return 0
+
+
+def _exit_code(e):
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    sys.stderr.write('{0}\n'.format(e.code))
+    return 1
+
+
+def _relay_client(sock):
+    reader = _FrameReader(sock)
+    started = False
+    stdin = _stdin_fd()
+    while True:
+        inputs = [sock] + ([stdin] if started and stdin is not None else [])
+        readable, _, _ = _select(inputs, [], [])
+        if stdin in readable:
+            data = os.read(stdin, BUFSIZE)
+            try:
+                _send(sock, STDIN, data)
+            except socket.error:
+                data = ''
+            if not data:
+                stdin = None
+        if sock not in readable:
+            continue
+        if not reader.read():
+            if not started:
+                raise _NotStarted()
+            sys.stderr.write('error: Lost connection to the claw daemon\n')
+            return 1
+        while reader.frames:
+            channel, data = reader.frames.popleft()
+            if channel == STARTED:
+                started = True
+            elif channel == STDOUT:
+                _write_all(1, data)
+            elif channel == STDERR:
+                _write_all(2, data)
+            elif channel == EXIT:
+                return int(data)
+
+
+class _NotStarted(Exception):
+    pass
+
+
+class _FrameReader(object):
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = ''
+        self.frames = collections.deque()
+
+    def read(self):
+        """Read available data into `frames`, returns False on EOF."""
+        data = self.sock.recv(BUFSIZE)
+        if not data:
+            return False
+        self.buffer += data
+        while len(self.buffer) >= FRAME_HEADER.size:
+            channel, length = FRAME_HEADER.unpack_from(self.buffer)
+            end = FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            self.frames.append((channel, self.buffer[FRAME_HEADER.size:end]))
+            self.buffer = self.buffer[end:]
+        return True
+
+    def next_frame(self):
+        while not self.frames:
+            if not self.read():
+                raise EOFError()
+        return self.frames.popleft()
+
+
+def _send(sock, channel, data=''):
+    sock.sendall(FRAME_HEADER.pack(channel, len(data)) + data)
+
+
+def _write_stdin(fd, data):
+    # An empty frame signals EOF, as does a worker that stopped reading
+    try:
+        if data:
+            _write_all(fd, data)
+            return fd
+    except OSError as e:
+        if e.errno != errno.EPIPE:
+            raise
+    os.close(fd)
+    return None
+
+
+def _write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _stdin_fd():
+    try:
+        fd = sys.stdin.fileno()
+        os.fstat(fd)
+        return fd
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _select(*args):
+    while True:
+        try:
+            return select.select(*args)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+
+
+def _reap():
+    reaped = set()
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except OSError:
+            break
+        if not pid:
+            break
+        reaped.add(pid)
+    return reaped
+
+
+def _killpg(pid, sig):
+    try:
+        os.killpg(pid, sig)
+    except OSError:
+        pass
+
+
+def _unlink(socket_path):
+    try:
+        os.unlink(socket_path)
+    except OSError:
+        pass
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], float(sys.argv[2]))
@@ -0,0 +1,143 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Following the events of an execution until it ends.
+
+Events are fetched in batches from a cursor (the number of events already
+fetched), and all available events are fetched before waiting for more, so
+the output never falls behind the manager. The wait between fetches grows
+while there are no new events and is reset when there are.
+
+Each batch is written to the console with a single write, and, as JSON lines,
+to an events file.
+"""
+
+import json
+import os
+import sys
+import time
+
+import argh
+
+from claw.lazy import lazy_import
+
+logs = lazy_import('cloudify.logs')
+
+BATCH_SIZE = 1000
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 5
+# How long to wait for the workflow end event once the execution ended
+END_EVENT_GRACE = 5
+BUFSIZE = 64 * 1024
+WORKFLOW_END_TYPES = ('workflow_succeeded', 'workflow_failed',
+                      'workflow_cancelled')
+END_STATES = ('terminated', 'failed', 'cancelled')
+
+
+class EventFollower(object):
+
+    def __init__(self, client, execution_id, include_logs=False,
+                 events_path=None, stream=None, batch_size=BATCH_SIZE):
+        self.client = client
+        self.execution_id = execution_id
+        self.include_logs = include_logs
+        self.events_path = events_path
+        self.stream = stream or sys.stdout
+        self.batch_size = batch_size
+        self.cursor = 0
+        self.ended = False
+        self._events_file = None
+
+    def fetch(self):
+        """Fetch and write all the events available, returning their
+        number."""
+        fetched = 0
+        while True:
+            response = self.client.events.list(
+                execution_id=self.execution_id,
+                include_logs=self.include_logs,
+                _offset=self.cursor,
+                _size=self.batch_size,
+                _sort='@timestamp')
+            events = response.items
+            self.cursor += len(events)
+            fetched += len(events)
+            self._write(events)
+            if not events or self.cursor >= response.metadata.pagination.total:
+                return fetched
+
+    def wait(self, timeout=None):
+        """Follow the events until the execution ends (raising
+        argh.CommandError after `timeout` seconds). Returns the ended
+        execution."""
+        deadline = time.time() + timeout if timeout is not None else None
+        interval = MIN_INTERVAL
+        try:
+            while True:
+                fetched = self.fetch()
+                execution = self.client.executions.get(self.execution_id)
+                if execution.status in END_STATES:
+                    self._wait_for_end_event()
+                    return execution
+                if deadline and time.time() > deadline:
+                    raise argh.CommandError(
+                        "Timed out waiting for execution '{0}' of "
+                        "deployment '{1}'".format(execution.id,
+                                                  execution.deployment_id))
+                interval = (MIN_INTERVAL if fetched
+                            else min(interval * 2, MAX_INTERVAL))
+                if deadline:
+                    interval = max(min(interval, deadline - time.time()), 0)
+                time.sleep(interval)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._events_file:
+            self._events_file.close()
+            self._events_file = None
+
+    def _wait_for_end_event(self):
+        # Events may still be on their way when the execution status
+        # changes
+        deadline = time.time() + END_EVENT_GRACE
+        interval = MIN_INTERVAL
+        while not self.ended and time.time() < deadline:
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_INTERVAL)
+            self.fetch()
+
+    def _write(self, events):
+        if not events:
+            return
+        lines = []
+        for event in events:
+            if event.get('event_type') in WORKFLOW_END_TYPES:
+                self.ended = True
+            line = logs.create_event_message_prefix(event)
+            if line:
+                lines.append(line)
+        if lines:
+            self.stream.write('{0}\n'.format('\n'.join(lines)))
+            self.stream.flush()
+        if self.events_path:
+            if not self._events_file:
+                events_dir = os.path.dirname(self.events_path)
+                if not os.path.isdir(events_dir):
+                    os.makedirs(events_dir)
+                self._events_file = open(self.events_path, 'a', BUFSIZE)
+            self._events_file.write(''.join('{0}\n'.format(json.dumps(event))
+                                            for event in events))
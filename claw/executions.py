@@ -0,0 +1,123 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Waiting for (and cancelling) the executions of deployments.
+
+All pending executions are tracked together: each tick refreshes them with a
+single list request, ticks back off exponentially (with jitter, so clients
+waiting on the same manager don't poll in lockstep), and requests that
+concern several executions (cancel, update) are sent concurrently.
+
+Usable from scripts as well:
+
+    from claw import cosmo, executions
+    executions.wait(cosmo.client, 'my_deployment', cancel=True, timeout=60)
+"""
+
+import logging
+import random
+import time
+
+from claw import parallel
+
+STOP_DEPLOYMENT_ENVIRONMENT = '_stop_deployment_environment'
+CREATE_DEPLOYMENT_ENVIRONMENT = 'create_deployment_environment'
+TERMINATED = 'terminated'
+CANCELLED = 'cancelled'
+END_STATES = (TERMINATED, 'failed', CANCELLED)
+DEFAULT_TIMEOUT = 10
+MIN_DELAY = 0.5
+MAX_DELAY = 5
+FIELDS = ['id', 'status', 'workflow_id', 'deployment_id']
+
+
+def wait(client, deployment_id=None, cancel=False, timeout=DEFAULT_TIMEOUT,
+         logger=None):
+    """Wait up to `timeout` seconds (overall) for the executions of
+    `deployment_id` (of all deployments if None) to end.
+
+    With `cancel`, running executions are cancelled first. Those that still
+    haven't ended by the deadline are then marked as ended: cancelled, or
+    terminated for create_deployment_environment executions, which are
+    marked as terminated if they ended otherwise too.
+
+    Returns the executions that did not end.
+    """
+    logger = logger or logging.getLogger(__name__)
+    deadline = time.time() + timeout
+    executions = _list(client, deployment_id)
+    pending = dict((e.id, e) for e in executions
+                   if e.status not in END_STATES)
+    if cancel:
+        _concurrently(
+            logger, 'Failed marking execution {0} as terminated',
+            lambda e: client.executions.update(e.id, status=TERMINATED),
+            [e for e in executions if e.status in END_STATES and
+             e.status != TERMINATED and
+             e.workflow_id == CREATE_DEPLOYMENT_ENVIRONMENT])
+        _concurrently(
+            logger, 'Failed cancelling execution {0}',
+            lambda e: client.executions.cancel(e.id),
+            [e for e in pending.values()
+             if e.workflow_id != STOP_DEPLOYMENT_ENVIRONMENT])
+    delay = MIN_DELAY
+    while pending and time.time() < deadline:
+        logger.info('Waiting for {0} executions to end: {1}'.format(
+            len(pending), ', '.join(
+                '{0}[{1}] ({2})'.format(e.id, e.workflow_id, e.status)
+                for e in sorted(pending.values(), key=lambda e: e.id))))
+        time.sleep(max(min(delay * random.uniform(0.5, 1),
+                           deadline - time.time()), 0))
+        delay = min(delay * 2, MAX_DELAY)
+        for e in _list(client, deployment_id):
+            if e.id not in pending:
+                continue
+            if e.status in END_STATES:
+                del pending[e.id]
+            else:
+                pending[e.id] = e
+    if cancel and pending:
+        def mark_ended(e):
+            new_status = (TERMINATED
+                          if e.workflow_id == CREATE_DEPLOYMENT_ENVIRONMENT
+                          else CANCELLED)
+            logger.info('Execution {0} did not reach a final state. '
+                        'Manually setting status: {1}'.format(e.id,
+                                                              new_status))
+            client.executions.update(e.id, status=new_status)
+        ended = _concurrently(logger, 'Failed updating execution {0}',
+                              mark_ended, pending.values())
+        for e in ended:
+            del pending[e.id]
+    return pending.values()
+
+
+def _list(client, deployment_id):
+    return client.executions.list(deployment_id,
+                                  include_system_workflows=True,
+                                  _include=FIELDS)
+
+
+def _concurrently(logger, error_message, func, executions):
+    """Call `func` with each of `executions` concurrently, logging failures.
+    Returns the executions it succeeded for."""
+    succeeded = []
+    for e, _, error in parallel.call_threads(func, executions):
+        if error:
+            logger.warn('{0}: {1}'.format(error_message.format(e.id), error))
+        else:
+            succeeded.append(e)
+    return succeeded
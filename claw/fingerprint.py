@@ -0,0 +1,181 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Fingerprints of generated configuration (and blueprint) directories.
+
+A generated directory records the fingerprint of everything it was generated
+from along with the stat of every file it generated. Regenerating it with
+the same fingerprint, while its files are untouched, is a no-op. Otherwise,
+only files that differ from their source are linked again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from claw import cache
+from claw import store
+
+STATE_NAME = '.generated.json'
+
+
+def compute(**inputs):
+    """Fingerprint of `inputs` (JSON-like values)."""
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True,
+                                   default=repr)).hexdigest()
+
+
+def manifest(root):
+    """relative path -> [size, mtime] of the files under `root`, and
+    relative path -> None for its directories. Symlinks are followed, as
+    `shutil.copytree` does by default."""
+    result = {}
+    for dir_path, dir_names, file_names in os.walk(root, followlinks=True):
+        rel_dir = os.path.relpath(dir_path, root)
+        for name in dir_names:
+            result[os.path.normpath(os.path.join(rel_dir, name))] = None
+        for name in file_names:
+            stat = os.stat(os.path.join(dir_path, name))
+            result[os.path.normpath(os.path.join(rel_dir, name))] = [
+                stat.st_size, stat.st_mtime]
+    return result
+
+
+def is_racy(source_manifest, now=None):
+    now = now or time.time()
+    return any(stat and cache.is_racy(stat[1], now)
+               for stat in source_manifest.values())
+
+
+def is_current(generated_dir, fingerprint):
+    """Whether `generated_dir` was generated with `fingerprint` and none of
+    the files it generated changed since."""
+    if not fingerprint:
+        return False
+    state = _load_state(generated_dir)
+    if not state or state.get('fingerprint') != fingerprint:
+        return False
+    for rel_path, recorded in state['files'].items():
+        file_path = os.path.join(generated_dir, rel_path)
+        if recorded is None:
+            if not os.path.isdir(file_path):
+                return False
+            continue
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        size, mtime, digest = recorded
+        if [stat.st_size, stat.st_mtime] != [size, mtime]:
+            return False
+        if digest and _digest(file_path) != digest:
+            return False
+    return True
+
+
+def remove_unexpected(generated_dir, expected):
+    """Remove everything in `generated_dir` that is not in `expected`
+    (relative paths, directories included)."""
+    _remove_state(generated_dir)
+    for dir_path, dir_names, file_names in os.walk(generated_dir):
+        rel_dir = os.path.relpath(dir_path, generated_dir)
+        for name in list(dir_names):
+            full_path = os.path.join(dir_path, name)
+            rel_path = os.path.normpath(os.path.join(rel_dir, name))
+            if rel_path not in expected or os.path.islink(full_path):
+                dir_names.remove(name)
+                _remove(full_path)
+        for name in file_names:
+            rel_path = os.path.normpath(os.path.join(rel_dir, name))
+            if rel_path not in expected:
+                _remove(os.path.join(dir_path, name))
+
+
+def sync_tree(source_dir, target_dir, source_manifest, now=None):
+    """Make `target_dir` a copy of `source_dir` (linked from the store, see
+    `claw.store`), linking only files that differ from their source by size
+    or mtime.
+
+    Stale files in `target_dir` should be removed beforehand (see
+    `remove_unexpected`).
+    """
+    now = now or time.time()
+    if not os.path.isdir(target_dir):
+        os.makedirs(target_dir)
+    for rel_path, stat in sorted(source_manifest.items()):
+        target_path = os.path.join(target_dir, rel_path)
+        if stat is None:
+            if not os.path.isdir(target_path):
+                os.makedirs(target_path)
+            continue
+        if not cache.is_racy(stat[1], now):
+            try:
+                target_stat = os.stat(target_path)
+                if [target_stat.st_size, target_stat.st_mtime] == stat:
+                    continue
+            except OSError:
+                pass
+        store.link(os.path.join(source_dir, rel_path), target_path)
+
+
+def record(generated_dir, fingerprint, generated):
+    """Record `fingerprint` and the current stat of the `generated` files
+    (relative paths) in `generated_dir`."""
+    now = time.time()
+    files = {}
+    for rel_path in generated:
+        file_path = os.path.join(generated_dir, rel_path)
+        if os.path.isdir(file_path):
+            files[rel_path] = None
+            continue
+        stat = os.stat(file_path)
+        # A racy file may still change without its stat changing, so its
+        # content is verified too
+        digest = (_digest(file_path) if cache.is_racy(stat.st_mtime, now)
+                  else None)
+        files[rel_path] = [stat.st_size, stat.st_mtime, digest]
+    state_path = os.path.join(generated_dir, STATE_NAME)
+    with open(state_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'files': files}, f)
+
+
+def _load_state(generated_dir):
+    try:
+        with open(os.path.join(generated_dir, STATE_NAME)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _remove_state(generated_dir):
+    try:
+        os.remove(os.path.join(generated_dir, STATE_NAME))
+    except OSError:
+        pass
+
+
+def _remove(file_path):
+    if os.path.isdir(file_path) and not os.path.islink(file_path):
+        shutil.rmtree(file_path)
+    else:
+        os.remove(file_path)
+
+
+def _digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
@@ -0,0 +1,29 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import importlib
+
+from proxy_tools import Proxy
+
+
+def lazy_import(name):
+    """Proxy to the module named `name` that only imports it on first use.
+
+    Used for heavy dependencies (cosmo_tester, cloudify_rest_client, fabric,
+    sh, ...) so that cheap code paths such as --help and bash completion
+    don't pay for importing them.
+    """
+    return Proxy(lambda: importlib.import_module(name))
@@ -14,8 +14,10 @@
 # limitations under the License.
 ############
 
+import os
 import sys
 import logging
+from contextlib import contextmanager
 
 
 def setup_logging():
@@ -27,3 +29,67 @@ def setup_logging():
     handler.setLevel(logging.WARNING)
     root_logger.setLevel(logging.WARNING)
     root_logger.addHandler(handler)
+
+
+class PrefixedWriter(object):
+    """File like object that writes to `log_file` as is and to `stream`
+    line by line, each line prefixed with `prefix`.
+
+    Complete lines are written (and flushed) to `stream` together, so the
+    output of processes sharing it is interleaved by line.
+    """
+
+    def __init__(self, stream, prefix, log_file=None):
+        self.stream = stream
+        self.prefix = prefix
+        self.log_file = log_file
+        self._partial_line = ''
+
+    def write(self, data):
+        if self.log_file:
+            self.log_file.write(data)
+        lines = (self._partial_line + data).split('\n')
+        self._partial_line = lines.pop()
+        if lines:
+            self.stream.write(''.join('{0}{1}\n'.format(self.prefix, line)
+                                      for line in lines))
+            self.stream.flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self.log_file:
+            self.log_file.flush()
+        self.stream.flush()
+
+    def close(self):
+        # The log file already has the partial line, as is
+        if self._partial_line:
+            self.stream.write('{0}{1}\n'.format(
+                self.prefix, self._partial_line))
+            self._partial_line = ''
+        self.flush()
+
+    def isatty(self):
+        return False
+
+
+@contextmanager
+def redirect_output(log_path, prefix):
+    """Write stdout and stderr to `log_path` and, prefixed with `prefix`, to
+    the original streams."""
+    log_dir = os.path.dirname(log_path)
+    if not os.path.isdir(log_dir):
+        os.makedirs(log_dir)
+    stdout, stderr = sys.stdout, sys.stderr
+    with open(log_path, 'w') as log_file:
+        sys.stdout = PrefixedWriter(stdout, prefix, log_file)
+        sys.stderr = PrefixedWriter(stderr, prefix, log_file)
+        try:
+            yield
+        finally:
+            sys.stdout.close()
+            sys.stderr.close()
+            sys.stdout, sys.stderr = stdout, stderr
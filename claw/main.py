@@ -24,10 +24,13 @@ import argh.utils
 
 from claw import configuration
 from claw import commands
+from claw.completion import completion
 from claw.settings import settings
 
 
 def main():
+    if '_ARGCOMPLETE' in os.environ and completion.complete_from_cache():
+        os._exit(0)
     logs.setup_logging()
     if len(sys.argv) > 1 and os.path.isfile(sys.argv[1]):
         try:
@@ -46,6 +49,8 @@ def main():
             except argh.CommandError as e:
                 sys.exit('error: {0}'.format(e))
         parser.add_commands(commands.app.commands)
+        if '_ARGCOMPLETE' in os.environ and settings.settings_path.exists():
+            completion.update_cache(parser)
         errors = StringIO()
         parser.dispatch(errors_file=errors)
         errors_value = errors.getvalue()
@@ -0,0 +1,168 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import Queue
+import multiprocessing
+import signal
+from multiprocessing.pool import ThreadPool
+import sys
+import traceback
+
+import argh
+
+# Pool.map_async(...).get() without a timeout can't be interrupted
+ONE_YEAR = 60 * 60 * 24 * 365
+DEFAULT_THREADS = 10
+
+
+def run(func, items, jobs=None):
+    """Call `func` with each of `items` in a pool of up to `jobs` (default:
+    number of CPUs) processes.
+
+    Workers are forked, so anything loaded before calling `run` (e.g. parsed
+    yaml files) is shared with them. `func` must be picklable (a module level
+    function, or a functools.partial of one).
+
+    Returns a list of (item, error message) for the failed calls, in the
+    order of `items`.
+    """
+    return [(item, error) for item, _, error in call_all(func, items, jobs)
+            if error]
+
+
+def call_all(func, items, jobs=None):
+    """Same as `run`, for calls whose (picklable) results are needed.
+
+    Returns a list of (item, result, error message) for all calls, in the
+    order of `items`. `result` is None for failed calls and `error` is None
+    for successful ones.
+    """
+    items = list(items)
+    if not items:
+        return []
+    jobs = min(jobs or multiprocessing.cpu_count(), len(items))
+    if jobs == 1:
+        results = [_call((func, item)) for item in items]
+    else:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pool = multiprocessing.Pool(jobs, initializer=_init_worker)
+        try:
+            results = pool.map_async(_call, [(func, item) for item in items],
+                                     chunksize=1).get(ONE_YEAR)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    return [(item, result, error)
+            for item, (result, error) in zip(items, results)]
+
+
+def call_threads(func, items, jobs=DEFAULT_THREADS):
+    """Same as `call_all`, in a pool of up to `jobs` threads, for calls that
+    mostly wait on I/O (e.g. REST requests). `func` needn't be picklable."""
+    items = list(items)
+    if not items:
+        return []
+    pool = ThreadPool(min(jobs, len(items)))
+    try:
+        results = pool.map_async(_call, [(func, item) for item in items],
+                                 chunksize=1).get(ONE_YEAR)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return [(item, result, error)
+            for item, (result, error) in zip(items, results)]
+
+
+def call_ordered(func, items, after, jobs=DEFAULT_THREADS):
+    """Same as `call_threads`, only calling `func` with an item once it
+    was called successfully with every item in `after[item]` (those of them
+    that are in `items`).
+
+    Items whose calls would come after a failed call (or that are part of a
+    cycle) fail without being called.
+    """
+    items = list(items)
+    if not items:
+        return []
+    waiting = dict((item, set(after.get(item, ())) & set(items) - {item})
+                   for item in items)
+    results = {}
+    done = Queue.Queue()
+    pool = ThreadPool(min(jobs, len(items)))
+    running = [0]
+
+    def start(item):
+        running[0] += 1
+        pool.apply_async(_call, [(func, item)],
+                         callback=lambda result: done.put((item, result)))
+
+    def finish(item, result):
+        results[item] = result
+        for other in items:
+            if other in results or item not in waiting[other]:
+                continue
+            if result[1] is not None:
+                finish(other, (None, 'Not done, as {0} failed'.format(item)))
+                continue
+            waiting[other].remove(item)
+            if not waiting[other]:
+                start(other)
+
+    try:
+        for item in items:
+            if not waiting[item]:
+                start(item)
+        while running[0]:
+            item, result = done.get(True, ONE_YEAR)
+            running[0] -= 1
+            finish(item, result)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    for item in items:
+        if item not in results:
+            results[item] = (None, 'Not done, as it is part of a dependency '
+                                   'cycle')
+    return [(item, ) + results[item] for item in items]
+
+
+def _init_worker():
+    # Interrupts are handled by the parent, which terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _call(func_and_item):
+    func, item = func_and_item
+    try:
+        return func(item), None
+    except argh.CommandError as e:
+        return None, str(e)
+    except Exception as e:
+        traceback.print_exc()
+        return None, '{0}: {1}'.format(type(e).__name__, e)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
@@ -14,47 +14,349 @@
 # limitations under the License.
 ############
 
+import collections
 import copy
 import importlib
+import json
 import os
+import re
 
+from path import path
 from cosmo_tester.framework import util
 
+from claw import yaml_io
+
+APPEND = 'append'
+
+# 'module:func' -> function
+_funcs = {}
+
+_SEGMENT_PATTERN = re.compile(r'^(.+)\[(\d+|{0})\]$'.format(APPEND), re.S)
+_SPLIT_PATTERN = re.compile(r'(?<!\\)\.')
+
 
 class YamlPatcher(util.YamlPatcher):
 
+    # Same as the base class, only reading and writing through yaml_io
+    # (which also keeps its parsed documents cache up to date). `obj` may be
+    # passed to patch a document that is already in memory.
+    def __init__(self, yaml_path, is_json=False, default_flow_style=True,
+                 obj=None):
+        self.yaml_path = path(yaml_path)
+        if obj is None:
+            obj = yaml_io.load_file(self.yaml_path) or {}
+        self.obj = obj
+        self.is_json = is_json
+        self.default_flow_style = default_flow_style
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not exc_type:
+            self.write()
+
+    def write(self):
+        if self.is_json:
+            yaml_io.write_file(self.yaml_path, json.dumps(self.obj))
+        else:
+            yaml_io.dump_file(self.obj, self.yaml_path,
+                              default_flow_style=self.default_flow_style)
+
     def set_value(self, prop_path, new_value):
-        obj, prop_name = self._get_parent_obj_prop_name_by_path(prop_path)
-        if isinstance(new_value, dict) and new_value.get('func'):
-            func_name = new_value['func']
-            module, func = func_name.split(':')
-            module = importlib.import_module(module)
-            func = getattr(module, func)
-            args = copy.copy(new_value.get('args', []))
-            args.insert(0, obj.get(prop_name))
-            kwargs = new_value.get('kwargs', {})
-            obj[prop_name] = func(*args, **kwargs)
+        Overrides({prop_path: new_value}).apply(self.obj)
+
+    def apply(self, overrides):
+        """Set all `overrides` (property path -> value, as accepted by
+        `set_value`) in a single pass over the document."""
+        if not isinstance(overrides, Overrides):
+            overrides = Overrides(overrides)
+        overrides.apply(self.obj)
+
+
+class Overrides(object):
+    """Override paths compiled into a trie.
+
+    Paths use the `YamlPatcher.set_value` syntax: segments separated by `.`
+    (escaped as `\\.`), `name[N]` to descend into a list item and, in the last
+    segment, `name[N]` or `name[append]` to set or append a list item. Values
+    may be `{'func': 'module:func', 'args': [...], 'kwargs': {...}}` in which
+    case the function is called with the current value and its result is set.
+
+    Applying visits every path segment once, no matter how many paths share
+    it. A value set on a path is set before the paths below it are applied.
+    """
+
+    def __init__(self, overrides):
+        self._root = _Node()
+        items = overrides.items() if isinstance(overrides, dict) else overrides
+        for prop_path, value in items:
+            self._add(prop_path, value)
+
+    def _add(self, prop_path, value):
+        segments = [_parse_segment(s) for s in _split_path(prop_path)]
+        node = self._root
+        for name, index in segments[:-1]:
+            if index == APPEND:
+                _raise_illegal(prop_path)
+            node = node.child(name, index, prop_path)
+        name, index = segments[-1]
+        node = node.child(name, index, prop_path)
+        if index == APPEND:
+            node.values.append(value)
         else:
-            super(YamlPatcher, self).set_value(prop_path, new_value)
+            node.values[:] = [value]
+
+    def apply(self, obj):
+        _apply(self._root, obj)
+        return obj
+
+
+class _Node(object):
+
+    __slots__ = ('children', 'values', 'path')
+
+    def __init__(self, path=None):
+        self.children = collections.OrderedDict()
+        self.values = []
+        self.path = path
+
+    def child(self, name, index, prop_path):
+        key = name, index
+        node = self.children.get(key)
+        if node is None:
+            node = self.children[key] = _Node(prop_path)
+        return node
+
+
+def _apply(node, obj):
+    for (name, index), child in node.children.items():
+        if index is None:
+            for value in child.values:
+                obj[name] = _resolve(value, obj.get(name))
+            if child.children:
+                if name not in obj:
+                    obj[name] = {}
+                _apply(child, obj[name])
+            continue
+        items = obj.get(name) if isinstance(obj, dict) else None
+        if not isinstance(items, list):
+            _raise_illegal(child.path)
+        if index == APPEND:
+            for value in child.values:
+                items.append(_resolve(value, None))
+            continue
+        for value in child.values:
+            current = items[index] if index < len(items) else None
+            items[index] = _resolve(value, current)
+        if child.children:
+            _apply(child, items[index])
+
+
+def _resolve(value, current_value):
+    if isinstance(value, dict) and value.get('func'):
+        args = [current_value] + list(value.get('args', []))
+        kwargs = value.get('kwargs', {})
+        return _function(value['func'])(*args, **kwargs)
+    return value
+
+
+def _function(func_name):
+    func = _funcs.get(func_name)
+    if func is None:
+        module, name = func_name.split(':')
+        func = _funcs[func_name] = getattr(importlib.import_module(module),
+                                           name)
+    return func
+
+
+def _split_path(prop_path):
+    return [segment.replace('\\.', '.')
+            for segment in _SPLIT_PATTERN.split(prop_path)]
+
+
+def _parse_segment(segment):
+    match = _SEGMENT_PATTERN.match(segment)
+    if not match:
+        return segment, None
+    name, index = match.groups()
+    return name, index if index == APPEND else int(index)
+
+
+def _raise_illegal(prop_path):
+    raise RuntimeError('illegal path: {0}'.format(prop_path))
+
+
+class YamlTransaction(object):
+    """Patches to several yaml files, applied in memory.
+
+    Each file is loaded once (when first patched) and written once, atomically,
+    on `commit`.
+    """
+
+    def __init__(self):
+        self._patchers = collections.OrderedDict()
+        self._after_commit = []
+
+    def patcher(self, yaml_path, default_flow_style=False):
+        key = os.path.abspath(yaml_path)
+        if key not in self._patchers:
+            self._patchers[key] = YamlPatcher(
+                yaml_path, default_flow_style=default_flow_style)
+        return self._patchers[key]
+
+    def get(self, yaml_path):
+        """Copy of the pending document of `yaml_path` (None if the file
+        was not touched by this transaction)."""
+        patch = self._patchers.get(os.path.abspath(yaml_path))
+        return copy.deepcopy(patch.obj) if patch else None
+
+    def set(self, yaml_path, obj, default_flow_style=False):
+        self._patchers[os.path.abspath(yaml_path)] = YamlPatcher(
+            yaml_path, default_flow_style=default_flow_style,
+            obj=copy.deepcopy(obj))
+
+    def after_commit(self, callback):
+        """Call `callback` once the files are written."""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        for patch in self._patchers.values():
+            patch.write()
+        self._patchers.clear()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
 
 
 # Some prebuilt functions
 #########################
 
 def filter_list(current_value, include):
-    def is_included(_item):
-        for included in include:
-            if isinstance(included, basestring):
-                if included in _item:
-                    return True
-            elif isinstance(included, dict):
-                if all([value in (_item.get(key) or '')
-                        for key, value in included.items()]):
-                    return True
+    return ListFilter(include).filter(current_value)
+
+
+class ListFilter(object):
+    """The `include` rules of `filter_list`, compiled.
+
+    An item is included if any rule matches it. A string rule matches items
+    it is contained in (a substring of a string item, a key of a dict item).
+    A dict rule matches dict items whose values contain all of the rule's
+    values (by key).
+
+    String rules are checked against string items with a single regular
+    expression and against dict items with set lookups. Single key dict rules
+    are grouped by key, each key getting its own regular expression.
+    """
+
+    def __init__(self, include):
+        self.include = include
+        strings = []
+        dicts = []
+        for rule in include:
+            if isinstance(rule, basestring):
+                strings.append(rule)
+            elif isinstance(rule, dict):
+                dicts.append(rule)
             else:
-                raise NotImplementedError(str(included))
-        return False
-    return filter(is_included, current_value)
+                raise NotImplementedError(str(rule))
+        self._has_dicts = bool(dicts)
+        self._strings = frozenset(strings)
+        self._strings_pattern = _literals_pattern(strings)
+        self._match_all_dicts = any(not rule for rule in dicts)
+        # single key rules with string values: key -> values
+        by_key = collections.OrderedDict()
+        self._other_dicts = []
+        for rule in dicts:
+            if len(rule) == 1 and isinstance(rule.values()[0], basestring):
+                key, value = rule.items()[0]
+                by_key.setdefault(key, []).append(value)
+            elif rule:
+                self._other_dicts.append(rule)
+        self._by_key = [(k, v, _literals_pattern(v))
+                        for k, v in by_key.items()]
+
+    def filter(self, items):
+        return filter(self.is_included, items)
+
+    def is_included(self, item):
+        if isinstance(item, basestring):
+            if self._strings_pattern and self._strings_pattern.search(item):
+                return True
+            if not self._has_dicts:
+                return False
+        elif isinstance(item, dict):
+            return self._is_dict_included(item)
+        # Anything else (and string items when there are dict rules, which
+        # fail on them) keeps the unindexed behavior
+        return _is_included(item, self.include)
+
+    def _is_dict_included(self, item):
+        if self._match_all_dicts:
+            return True
+        if self._strings and not self._strings.isdisjoint(item):
+            return True
+        for key, values, pattern in self._by_key:
+            value = item.get(key) or ''
+            if isinstance(value, basestring):
+                if pattern.search(value):
+                    return True
+            elif any(v in value for v in values):
+                return True
+        return any(_is_dict_rule_included(item, rule)
+                   for rule in self._other_dicts)
+
+
+def _is_included(item, include):
+    for included in include:
+        if isinstance(included, basestring):
+            if included in item:
+                return True
+        elif isinstance(included, dict):
+            if _is_dict_rule_included(item, included):
+                return True
+        else:
+            raise NotImplementedError(str(included))
+    return False
+
+
+def _is_dict_rule_included(item, rule):
+    return all([value in (item.get(key) or '')
+                for key, value in rule.items()])
+
+
+def _literals_pattern(literals):
+    """A regular expression searching for any of `literals`.
+
+    The literals are merged into a trie first, so the expression examines each
+    position of the searched string once per common prefix instead of once per
+    literal.
+    """
+    if not literals:
+        return None
+    if '' in literals:
+        return re.compile('')
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            if None in node:
+                # a prefix of this literal is already a literal
+                break
+            node = node.setdefault(char, {})
+        else:
+            node.clear()
+            node[None] = True
+    return re.compile(_trie_pattern(trie))
+
+
+def _trie_pattern(node):
+    parts = []
+    while len(node) == 1 and None not in node:
+        char, node = node.items()[0]
+        parts.append(re.escape(char))
+    if None not in node:
+        parts.append('(?:{0})'.format('|'.join(
+            re.escape(char) + _trie_pattern(child)
+            for char, child in sorted(node.items()))))
+    return ''.join(parts)
 
 
 def filter_dict(current_value, exclude):
@@ -0,0 +1,109 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Post bootstrap operations through the manager REST API.
+
+`Backend` has the same interface as the `claw.cfy` functions it replaces, so
+commands can use either, without spawning a `cfy` process per operation.
+Execution events are followed by `claw.events.EventFollower`.
+"""
+
+import time
+
+import argh
+
+from claw import yaml_io
+from claw.events import EventFollower
+from claw.lazy import lazy_import
+
+rest_exceptions = lazy_import('cloudify_rest_client.exceptions')
+
+CREATE_DEPLOYMENT_ENVIRONMENT = 'create_deployment_environment'
+
+
+class Backend(object):
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.client = conf.client
+        self.logger = conf.logger
+
+    def blueprints_upload(self, blueprint_path, blueprint_id):
+        self.logger.info('Uploading blueprint {0}...'.format(blueprint_path))
+        self.client.blueprints.upload(blueprint_path, blueprint_id)
+        self.logger.info("Blueprint uploaded. The blueprint's id is "
+                         "{0}".format(blueprint_id))
+
+    def blueprints_delete(self, blueprint_id):
+        self.logger.info('Deleting blueprint {0}...'.format(blueprint_id))
+        self.client.blueprints.delete(blueprint_id)
+        self.logger.info('Blueprint deleted')
+
+    def deployments_create(self, blueprint_id, deployment_id, inputs):
+        self.logger.info('Creating new deployment from blueprint {0}...'
+                         .format(blueprint_id))
+        self.client.deployments.create(blueprint_id, deployment_id,
+                                       inputs=yaml_io.load_file(inputs))
+        self.logger.info("Deployment created. The deployment's id is "
+                         "{0}".format(deployment_id))
+
+    def deployments_delete(self, deployment_id, ignore_live_nodes):
+        self.logger.info('Deleting deployment {0}...'.format(deployment_id))
+        self.client.deployments.delete(deployment_id,
+                                       ignore_live_nodes=ignore_live_nodes)
+        self.logger.info('Deployment deleted')
+
+    def executions_start(self, workflow, deployment_id, include_logs,
+                         timeout):
+        self.logger.info("Executing workflow '{0}' on deployment '{1}' "
+                         "[timeout={2} seconds]".format(workflow,
+                                                        deployment_id,
+                                                        timeout))
+        deadline = time.time() + timeout
+        try:
+            execution = self.client.executions.start(deployment_id, workflow)
+        except rest_exceptions.DeploymentEnvironmentCreationInProgressError:
+            self.logger.info('Deployment environment creation is in '
+                             'progress! Waiting for it to end...')
+            self._wait(self._environment_creation(deployment_id),
+                       include_logs, deadline)
+            execution = self.client.executions.start(deployment_id, workflow)
+        execution = self._wait(execution, include_logs, deadline)
+        if execution.status != execution.TERMINATED:
+            raise argh.CommandError(
+                "Execution of workflow '{0}' for deployment '{1}' {2}. "
+                "[error={3}]".format(workflow, deployment_id,
+                                     execution.status, execution.error))
+        self.logger.info("Finished executing workflow '{0}' on deployment "
+                         "'{1}'".format(workflow, deployment_id))
+
+    def _environment_creation(self, deployment_id):
+        executions = self.client.executions.list(
+            deployment_id, include_system_workflows=True)
+        for execution in executions:
+            if execution.workflow_id == CREATE_DEPLOYMENT_ENVIRONMENT:
+                return execution
+        raise argh.CommandError('No {0} execution found for deployment {1}'
+                                .format(CREATE_DEPLOYMENT_ENVIRONMENT,
+                                        deployment_id))
+
+    def _wait(self, execution, include_logs, deadline):
+        follower = EventFollower(
+            self.client, execution.id,
+            include_logs=include_logs,
+            events_path=self.conf.logs_dir / 'events' / '{0}.jsonl'.format(
+                execution.id))
+        return follower.wait(timeout=max(deadline - time.time(), 0))
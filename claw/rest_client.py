@@ -0,0 +1,207 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""REST clients of configurations.
+
+There is one client per configuration (and process), sending its requests
+through a pooled keep-alive `requests` session, so code that uses the client
+in a loop doesn't open a connection per request.
+
+The pool size and timeouts may be set in the handler configuration with
+`rest_pool_size`, `rest_connect_timeout` and `rest_read_timeout` (seconds).
+Reads don't time out unless `rest_read_timeout` is set, as uploading a large
+blueprint may take a while.
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+
+import requests
+from requests import adapters
+from cloudify_rest_client import CloudifyClient
+from cloudify_rest_client.client import (HTTPClient,
+                                         DEFAULT_API_VERSION,
+                                         DEFAULT_PROTOCOL)
+
+DEFAULT_PORT = 80
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = None
+REQUEST_METHODS = ('get', 'put', 'post', 'patch', 'delete', 'head')
+# Upper bounds (seconds) of the latency histogram buckets. Slower requests
+# are counted in an additional bucket.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# (pid, configuration) -> (options, client). The pid is part of the key as
+# pooled connections must not be shared with forked processes.
+_clients = {}
+_lock = threading.Lock()
+
+
+def get(configuration, handler_configuration):
+    """The client of `configuration`, created on first use (and when its
+    handler configuration manager or client settings change)."""
+    options = (
+        handler_configuration.get('manager_ip', 'localhost'),
+        handler_configuration.get('manager_port', DEFAULT_PORT),
+        handler_configuration.get('rest_pool_size', DEFAULT_POOL_SIZE),
+        handler_configuration.get('rest_connect_timeout',
+                                  DEFAULT_CONNECT_TIMEOUT),
+        handler_configuration.get('rest_read_timeout', DEFAULT_READ_TIMEOUT))
+    key = (os.getpid(), configuration)
+    with _lock:
+        cached = _clients.get(key)
+        if cached and cached[0] == options:
+            return cached[1]
+        if cached:
+            cached[1].close()
+        client = Client(*options)
+        _clients[key] = (options, client)
+        return client
+
+
+class SessionHTTPClient(HTTPClient):
+    """HTTPClient sending its requests through `session`.
+
+    HTTPClient is passed module level request functions (requests.get,
+    requests.put, ...), which open a connection per request. They are
+    replaced with their `session` equivalents.
+    """
+
+    _session_methods = {}
+    timeout = None
+    latency = None
+
+    def use_session(self, session, timeout, latency):
+        self.timeout = timeout
+        self.latency = latency
+        self._session_methods = dict(
+            (getattr(requests, name), getattr(session, name))
+            for name in REQUEST_METHODS)
+
+    def do_request(self, requests_method, *args, **kwargs):
+        if not self._session_methods:
+            return super(SessionHTTPClient, self).do_request(
+                requests_method, *args, **kwargs)
+        return super(SessionHTTPClient, self).do_request(
+            self._session_method(requests_method), *args, **kwargs)
+
+    def _session_method(self, requests_method):
+        method = self._session_methods.get(requests_method, requests_method)
+
+        @functools.wraps(requests_method)
+        def request(*args, **kwargs):
+            if kwargs.get('timeout') is None:
+                kwargs['timeout'] = self.timeout
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.latency.record(time.time() - start)
+        return request
+
+
+class Client(CloudifyClient):
+
+    # Used by rest clients that let subclasses choose their HTTP client
+    client_class = SessionHTTPClient
+
+    def __init__(self, host, port=DEFAULT_PORT, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, protocol=DEFAULT_PROTOCOL,
+                 headers=None, cert=None, trust_all=False):
+        super(Client, self).__init__(host, port, protocol=protocol,
+                                     headers=headers, cert=cert,
+                                     trust_all=trust_all)
+        self.latency = LatencyHistogram()
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=1,
+                                       pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not isinstance(self._client, SessionHTTPClient):
+            # Older rest clients always create a plain HTTPClient, which the
+            # resource clients (and the clients nested in them) were given
+            http_client = SessionHTTPClient(
+                host, self._client.port, protocol, DEFAULT_API_VERSION,
+                headers, None, cert, trust_all)
+            _replace_api(self, self._client, http_client, set())
+            self._client = http_client
+        self._client.use_session(self.session, self.timeout, self.latency)
+
+    def close(self):
+        self.session.close()
+
+
+def _replace_api(obj, old, new, seen):
+    """Replace `old` with `new` wherever `obj` and the rest client objects
+    it holds (recursively) reference it."""
+    seen.add(id(obj))
+    for name, value in vars(obj).items():
+        if value is old:
+            setattr(obj, name, new)
+        elif (id(value) not in seen and hasattr(value, '__dict__') and
+              type(value).__module__.startswith('cloudify_rest_client')):
+            _replace_api(value, old, new, seen)
+
+
+class LatencyHistogram(object):
+    """Latency of requests, counted in `LATENCY_BUCKETS` buckets."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the `percent` percentile
+        (float('inf') for the last bucket, None with no requests)."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),),
+                                self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return float('inf')
+
+    def __str__(self):
+        lines = []
+        lower = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            lines.append('{0:>6.0f}-{1:<6.0f}ms {2}'.format(
+                lower * 1000, bound * 1000, count))
+            lower = bound
+        lines.append('{0:>6.0f}+      ms {1}'.format(
+            lower * 1000, self.counts[-1]))
+        return '\n'.join(lines)
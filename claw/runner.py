@@ -0,0 +1,384 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""Running (`cfy`) subprocesses, many at a time, from a single thread.
+
+`Command` builds command lines the way `sh` does
+(``cfy.blueprints.upload(path, blueprint_id='bp')``), but calling it returns
+an `Operation` instead of starting a process. `run` runs operations
+concurrently, at most `jobs` at a time. Their stdout and stderr are read
+through non-blocking pipes multiplexed with select, and are written to the
+operation log (if any) and, line by line and prefixed with the operation
+name, to the console. A single unnamed operation without a log writes to the
+console directly instead, so `cfy` still sees a terminal (colors, line
+buffering).
+
+Operations run from the main thread get process groups of their own, so
+timed out operations are terminated along with the processes they started.
+Ctrl-C (SIGINT) is forwarded to them, and once they exit,
+`KeyboardInterrupt` is raised. Operations run from other threads stay in
+claw's process group and get Ctrl-C from the terminal directly.
+
+Usable from scripts as well:
+
+    from claw import cfy, runner
+    operations = [cfy.cfy.executions.start('install', deployment_id=d,
+                                           _name=d, _timeout=600)
+                  for d in deployments]
+    for operation in runner.run(operations, jobs=4):
+        print operation.name, operation.exit_code
+"""
+
+import errno
+import fcntl
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import argh
+
+from claw.logs import PrefixedWriter
+
+DEFAULT_JOBS = 10
+KILL_GRACE = 5
+READ_SIZE = 64 * 1024
+POLL_INTERVAL = 0.1
+NOT_FOUND_EXIT_CODE = 127
+
+# Default streams of the operations run by each thread (see `output`)
+_output = threading.local()
+
+
+class OperationError(argh.CommandError):
+
+    def __init__(self, operation):
+        super(OperationError, self).__init__(operation.error)
+        self.operation = operation
+
+
+class Operation(object):
+    """A command line to run, and, once run, its outcome."""
+
+    def __init__(self, args, name=None, cwd=None, env=None, timeout=None,
+                 log_path=None):
+        self.args = [str(a) for a in args]
+        self.name = name
+        self.cwd = cwd
+        self.env = env
+        self.timeout = timeout
+        self.log_path = log_path
+        self.exit_code = None
+        self.timed_out = False
+        self.duration = None
+
+    @property
+    def ok(self):
+        return self.exit_code == 0 and not self.timed_out
+
+    @property
+    def error(self):
+        if self.ok:
+            return None
+        if self.timed_out:
+            return '{0} timed out after {1} seconds'.format(self.command,
+                                                            self.timeout)
+        return '{0} failed with exit code {1}'.format(self.command,
+                                                      self.exit_code)
+
+    @property
+    def command(self):
+        return ' '.join(self.args)
+
+    def wait(self, stdout=None, stderr=None):
+        """Run the operation by itself, raising `OperationError` if it
+        failed."""
+        run([self], stdout=stdout, stderr=stderr)
+        if not self.ok:
+            raise OperationError(self)
+        return self
+
+    def __repr__(self):
+        return 'Operation({0!r})'.format(self.name or self.command)
+
+
+class Command(object):
+    """Build operations `sh` style: attributes are subcommands, keyword
+    arguments are options (``blueprint_id='bp'`` is ``--blueprint-id=bp``,
+    ``True`` is a flag, ``False`` and ``None`` are dropped) and keyword
+    arguments starting with an underscore (``_name``, ``_cwd``, ``_env``,
+    ``_timeout``, ``_log_path``) are passed to `Operation`."""
+
+    def __init__(self, *args):
+        self._args = list(args)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Command(*(self._args + [name.replace('_', '-')]))
+
+    def __call__(self, *args, **kwargs):
+        operation_kwargs = dict((key[1:], kwargs.pop(key))
+                                for key in list(kwargs)
+                                if key.startswith('_'))
+        return Operation(self._args + list(args) + _options(kwargs),
+                         **operation_kwargs)
+
+
+@contextmanager
+def output(stdout, stderr):
+    """Have operations run by the current thread write to `stdout` and
+    `stderr`, unless given other streams."""
+    previous = getattr(_output, 'streams', None)
+    _output.streams = (stdout, stderr)
+    try:
+        yield
+    finally:
+        _output.streams = previous
+
+
+def run(operations, jobs=DEFAULT_JOBS, stdout=None, stderr=None):
+    """Run `operations`, at most `jobs` at a time, and return them, with
+    their `exit_code`, `timed_out` and `duration` set.
+
+    Operations that run longer than their `timeout` are terminated (along
+    with the processes they started), and killed if they don't exit within
+    `KILL_GRACE` seconds.
+    """
+    operations = list(operations)
+    default_stdout, default_stderr = (getattr(_output, 'streams', None) or
+                                      (sys.stdout, sys.stderr))
+    stdout = stdout or default_stdout
+    stderr = stderr or default_stderr
+    direct = (len(operations) == 1 and
+              not operations[0].name and
+              not operations[0].log_path and
+              _fileno(stdout) is not None and
+              _fileno(stderr) is not None)
+    queue = list(reversed(operations))
+    running = []
+    interrupted = []
+
+    def forward_interrupt(signum, frame):
+        interrupted.append(signum)
+        for process in running:
+            process.interrupt()
+    try:
+        previous_handler = signal.signal(signal.SIGINT, forward_interrupt)
+        own_groups = True
+    except ValueError:
+        # Signal handlers can only be set from the main thread
+        own_groups = False
+    try:
+        while (queue and not interrupted) or running:
+            while (queue and not interrupted and
+                   len(running) < max(jobs or 1, 1)):
+                process = _Process(queue.pop(), stdout, stderr,
+                                   direct=direct, own_group=own_groups)
+                if process.start():
+                    running.append(process)
+            readers = dict((fd, process)
+                           for process in running
+                           for fd in process.fds)
+            timeout = min([POLL_INTERVAL] + [p.time_left() for p in running])
+            if readers:
+                ready = _select(list(readers), max(timeout, 0))
+                for fd in ready:
+                    readers[fd].read(fd)
+            else:
+                time.sleep(max(timeout, 0))
+            for process in list(running):
+                process.check_timeout()
+                if process.poll():
+                    running.remove(process)
+    finally:
+        if own_groups:
+            signal.signal(signal.SIGINT, previous_handler
+                          if previous_handler is not None
+                          else signal.SIG_DFL)
+        for process in running:
+            process.kill()
+            process.poll(block=True)
+    if interrupted:
+        raise KeyboardInterrupt()
+    return operations
+
+
+class _Process(object):
+
+    def __init__(self, operation, stdout, stderr, direct=False,
+                 own_group=True):
+        self.operation = operation
+        self.stdout = stdout
+        self.stderr = stderr
+        self.direct = direct
+        self.own_group = own_group
+        self.process = None
+        self.fds = []
+        self.sinks = {}
+        self.log_file = None
+        self.started = None
+        self.terminated = None
+
+    def start(self):
+        operation = self.operation
+        self.started = time.time()
+        if operation.log_path:
+            log_dir = os.path.dirname(operation.log_path)
+            if log_dir and not os.path.isdir(log_dir):
+                os.makedirs(log_dir)
+            self.log_file = open(operation.log_path, 'w')
+        prefix = '[{0}] '.format(operation.name) if operation.name else ''
+        out = PrefixedWriter(self.stdout, prefix, self.log_file)
+        err = PrefixedWriter(self.stderr, prefix, self.log_file)
+        if self.direct:
+            out.flush()
+            err.flush()
+            stdout, stderr = _fileno(self.stdout), _fileno(self.stderr)
+        else:
+            stdout = stderr = subprocess.PIPE
+        try:
+            with open(os.devnull) as devnull:
+                self.process = subprocess.Popen(
+                    operation.args,
+                    stdin=devnull,
+                    stdout=stdout,
+                    stderr=stderr,
+                    cwd=operation.cwd,
+                    env=operation.env,
+                    close_fds=True,
+                    preexec_fn=os.setpgrp if self.own_group else None)
+        except OSError as e:
+            err.write('{0}: {1}\n'.format(operation.args[0], e.strerror))
+            self._finish(NOT_FOUND_EXIT_CODE, [out, err])
+            return False
+        if self.direct:
+            return True
+        for pipe, sink in ((self.process.stdout, out),
+                           (self.process.stderr, err)):
+            fd = pipe.fileno()
+            fcntl.fcntl(fd, fcntl.F_SETFL,
+                        fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            self.fds.append(fd)
+            self.sinks[fd] = sink
+        return True
+
+    def read(self, fd):
+        try:
+            data = os.read(fd, READ_SIZE)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return
+            data = ''
+        if data:
+            self.sinks[fd].write(data)
+        else:
+            self.fds.remove(fd)
+
+    def time_left(self):
+        if self.terminated:
+            return self.terminated + KILL_GRACE - time.time()
+        if self.operation.timeout is None:
+            return POLL_INTERVAL
+        return self.started + self.operation.timeout - time.time()
+
+    def check_timeout(self):
+        if self.process.returncode is not None or self.time_left() > 0:
+            return
+        if self.terminated:
+            self._signal(signal.SIGKILL)
+        else:
+            self.operation.timed_out = True
+            self.terminated = time.time()
+            self._signal(signal.SIGTERM)
+
+    def interrupt(self):
+        if self.process.returncode is not None:
+            return
+        self._signal(signal.SIGINT)
+        if not self.terminated:
+            self.terminated = time.time()
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    def poll(self, block=False):
+        """Return whether the process ended and its output was read."""
+        if self.fds and not block:
+            return False
+        exit_code = self.process.wait() if block else self.process.poll()
+        if exit_code is None:
+            return False
+        for fd in list(self.fds):
+            self.read(fd)
+        if not self.direct:
+            self.process.stdout.close()
+            self.process.stderr.close()
+        self._finish(exit_code, self.sinks.values())
+        return True
+
+    def _signal(self, signum):
+        try:
+            if self.own_group:
+                os.killpg(self.process.pid, signum)
+            else:
+                os.kill(self.process.pid, signum)
+        except OSError:
+            pass
+
+    def _finish(self, exit_code, sinks):
+        for sink in sinks:
+            sink.close()
+        if self.log_file:
+            self.log_file.close()
+        self.operation.exit_code = exit_code
+        self.operation.duration = time.time() - self.started
+
+
+def _fileno(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, IOError, ValueError):
+        return None
+
+
+def _select(fds, timeout):
+    try:
+        return select.select(fds, [], [], timeout)[0]
+    except select.error as e:
+        if e.args[0] == errno.EINTR:
+            return []
+        raise
+
+
+def _options(kwargs):
+    options = []
+    for key, value in sorted(kwargs.items()):
+        if value is False or value is None:
+            continue
+        option = ('-{0}' if len(key) == 1 else '--{0}').format(
+            key.replace('_', '-'))
+        if value is True:
+            options.append(option)
+        elif len(key) == 1:
+            options.extend([option, value])
+        else:
+            options.append('{0}={1}'.format(option, value))
+    return options
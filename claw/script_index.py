@@ -0,0 +1,110 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import ast
+import os
+import time
+
+from claw import cache
+from claw.settings import settings
+
+INDEX_NAME = 'scripts-index.json'
+
+
+class ScriptIndex(object):
+    """On-disk index of the script based commands found in the scripts dirs.
+
+    A scripts dir is only rescanned when its mtime changes (adding, removing
+    or renaming a script). While rescanning, scripts whose own mtime and size
+    did not change reuse their previous entry instead of being parsed again.
+    """
+
+    def scripts(self):
+        index = cache.load(INDEX_NAME) or {}
+        cached_dirs = index.get('dirs', {})
+        dirs = {}
+        scripts = []
+        changed = False
+        for scripts_dir in settings.scripts:
+            key = str(scripts_dir)
+            dir_mtime = os.stat(scripts_dir).st_mtime
+            entry = cached_dirs.get(key)
+            if (not entry or entry['mtime'] != dir_mtime or
+                    entry['racy']):
+                entry = self._scan(scripts_dir, dir_mtime, entry)
+                changed = True
+            dirs[key] = entry
+            scripts.extend(entry['scripts'])
+        if changed or set(dirs) != set(cached_dirs):
+            cache.store(INDEX_NAME, {'dirs': dirs})
+        return scripts
+
+    def _scan(self, scripts_dir, dir_mtime, previous_entry):
+        previous = {s['path']: s for s in
+                    (previous_entry or {}).get('scripts', [])}
+        now = time.time()
+        scripts = []
+        for script_path in sorted(scripts_dir.files('*.py')):
+            stat = os.stat(script_path)
+            script = previous.get(str(script_path))
+            if (not script or script['mtime'] != stat.st_mtime or
+                    script['size'] != stat.st_size or
+                    cache.is_racy(script['mtime'], now)):
+                script = self._index_script(script_path, stat)
+            scripts.append(script)
+        return {
+            'mtime': dir_mtime,
+            'racy': cache.is_racy(dir_mtime, now),
+            'scripts': scripts
+        }
+
+    @staticmethod
+    def _index_script(script_path, stat):
+        doc = None
+        functions = {}
+        try:
+            module = ast.parse(script_path.text(), str(script_path))
+        except (SyntaxError, TypeError, ValueError):
+            # broken scripts still get a command, they fail when executed
+            module = None
+        if module:
+            doc = ast.get_docstring(module)
+            for node in module.body:
+                if isinstance(node, ast.FunctionDef):
+                    functions[node.name] = _signature(node.args)
+        return {
+            'name': script_path.basename()[:-len('.py')].replace('_', '-'),
+            'path': str(script_path),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'doc': doc,
+            'functions': functions
+        }
+
+
+def _signature(args):
+    names = [a.id if isinstance(a, ast.Name) else '...' for a in args.args]
+    optional = len(args.defaults)
+    params = names[:len(names) - optional]
+    params += ['{0}=...'.format(n) for n in names[len(names) - optional:]]
+    if args.vararg:
+        params.append('*{0}'.format(args.vararg))
+    if args.kwarg:
+        params.append('**{0}'.format(args.kwarg))
+    return ', '.join(params)
+
+
+script_index = ScriptIndex()
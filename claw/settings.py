@@ -17,13 +17,19 @@
 import os
 
 import argh
-import yaml
 from path import path
 
+from claw import yaml_io
+
 
 CLAW_SETTINGS = 'CLAW_SETTINGS'
 DEFAULT_SETTINGS_PATH = '~/.claw'
 DEFAULT_SCRIPTS_DIR = 'scripts'
+CACHE_DIR = '.cache'
+STORE_DIR = '.store'
+REST_BACKEND = 'rest'
+CLI_BACKEND = 'cli'
+BACKENDS = (REST_BACKEND, CLI_BACKEND)
 
 
 class Settings(object):
@@ -48,6 +54,14 @@ class Settings(object):
     def default_scripts_dir(self):
         return self.claw_home / DEFAULT_SCRIPTS_DIR
 
+    @property
+    def cache_dir(self):
+        return self.claw_home / CACHE_DIR
+
+    @property
+    def store_dir(self):
+        return self.claw_home / STORE_DIR
+
     @property
     def user_suites_yaml(self):
         return self.claw_home / 'suites.yaml'
@@ -64,12 +78,21 @@ class Settings(object):
     def scripts(self):
         return [path(scripts_dir) for scripts_dir in self.settings['scripts']]
 
+    @property
+    def backend(self):
+        backend = self.settings.get('backend', REST_BACKEND)
+        if backend not in BACKENDS:
+            raise argh.CommandError('Unknown backend: {0} (expected one of: '
+                                    '{1})'.format(backend,
+                                                  ', '.join(BACKENDS)))
+        return backend
+
     @property
     def settings(self):
         if not self.settings_path.exists():
             raise argh.CommandError('Run `claw init` to configure claw')
         if not self._settings:
-            self._settings = yaml.safe_load(self.settings_path.text())
+            self._settings = yaml_io.load(self.settings_path.text())
         return self._settings
 
     def write_settings(self,
@@ -79,23 +102,23 @@ class Settings(object):
         default_scripts_dir = os.path.join(claw_home, DEFAULT_SCRIPTS_DIR)
         main_suites_yaml = os.path.abspath(
             os.path.expanduser(main_suites_yaml_path))
-        self.settings_path.write_text(yaml.safe_dump({
+        self.settings_path.write_text(yaml_io.dump({
             'claw_home': claw_home,
             'main_suites_yaml': main_suites_yaml,
             'scripts': [default_scripts_dir]
         }, default_flow_style=False))
 
     def load_suites_yaml(self, variables=True):
-        suites_yaml = yaml.load(self.user_suites_yaml.text())
+        suites_yaml = yaml_io.load_file(self.user_suites_yaml)
         if variables:
-            main_suites_yaml = yaml.load(self.main_suites_yaml.text())
+            main_suites_yaml = yaml_io.load_file(self.main_suites_yaml)
             variables = main_suites_yaml.get('variables', {})
             variables.update(suites_yaml.get('variables', {}))
             suites_yaml['variables'] = variables
         return suites_yaml
 
     def load_blueprints_yaml(self, variables=True):
-        blueprints_yaml = yaml.load(self.blueprints_yaml.text())
+        blueprints_yaml = yaml_io.load_file(self.blueprints_yaml)
         if variables:
             suites_yaml = self.load_suites_yaml(variables=True)
             variables = suites_yaml['variables']
@@ -0,0 +1,170 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+"""A content-addressed store of the files copied into configurations.
+
+Files copied from blueprint directories are added to the store (once per
+content and mode) and hardlinked from it, so configurations generated from
+the same blueprints share their files. Changing one in place would change it
+in every configuration that links it, so claw replaces generated files when
+writing them (see `yaml_io.write_file`), and stored files are read-only, as a
+guard against other writers (root ignores it).
+Where hardlinks are not possible, files are reflinked (on filesystems that
+support it) or copied.
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import stat as stat_module
+import tempfile
+import threading
+import time
+
+from claw.settings import settings
+
+# linux/fs.h
+FICLONE = 0x40049409
+BUFSIZE = 1024 * 1024
+TMP_MAX_AGE = 60 * 60
+WRITE_BITS = stat_module.S_IWUSR | stat_module.S_IWGRP | stat_module.S_IWOTH
+
+
+def link(source_path, target_path):
+    """Make `target_path` a (read-only) copy of `source_path`, linked from
+    the store when possible."""
+    source_stat = os.stat(source_path)
+    object_path = _object_path(_digest(source_path), source_stat.st_mode)
+    try:
+        for _ in range(2):
+            if not os.path.exists(object_path):
+                _add(source_path, object_path)
+            try:
+                _replace(target_path, lambda tmp_path: os.link(object_path,
+                                                               tmp_path))
+                return
+            except OSError as e:
+                # The object may have just been collected, in which case it
+                # is added again
+                if e.errno != errno.ENOENT:
+                    raise
+    except (IOError, OSError):
+        pass
+    _replace(target_path, lambda tmp_path: _copy(source_path, tmp_path))
+
+
+def copy(source_path, target_path):
+    """Copy `source_path` to `target_path` (replacing the target, which may
+    be linked from the store, instead of writing to it)."""
+    _replace(target_path, lambda tmp_path: shutil.copy(source_path,
+                                                       tmp_path))
+
+
+def collect():
+    """Remove stored files no longer linked from anywhere.
+
+    Returns the number of removed files and the number of bytes reclaimed.
+    """
+    removed = reclaimed = 0
+    now = time.time()
+    objects_dir = _objects_dir()
+    if not objects_dir.isdir():
+        return removed, reclaimed
+    for object_dir in objects_dir.dirs():
+        for object_path in object_dir.files():
+            stat = os.lstat(object_path)
+            if object_path.basename().startswith('.'):
+                # Leftover of an interrupted add (or one in progress)
+                if stat.st_mtime > now - TMP_MAX_AGE:
+                    continue
+            elif stat.st_nlink > 1:
+                continue
+            try:
+                os.remove(object_path)
+            except OSError:
+                continue
+            removed += 1
+            reclaimed += stat.st_size
+        try:
+            os.rmdir(object_dir)
+        except OSError:
+            pass
+    return removed, reclaimed
+
+
+def _objects_dir():
+    return settings.store_dir / 'objects'
+
+
+def _object_path(digest, mode):
+    # Links share their mode, so files that only differ by mode are stored
+    # separately
+    mode = stat_module.S_IMODE(mode) & ~WRITE_BITS
+    return _objects_dir() / digest[:2] / '{0}-{1:o}'.format(digest[2:], mode)
+
+
+def _add(source_path, object_path):
+    object_dir = object_path.dirname()
+    object_dir.makedirs_p()
+    fd, tmp_path = tempfile.mkstemp(dir=object_dir, prefix='.')
+    os.close(fd)
+    try:
+        shutil.copy2(source_path, tmp_path)
+        os.chmod(tmp_path, stat_module.S_IMODE(os.stat(tmp_path).st_mode) &
+                 ~WRITE_BITS)
+        os.rename(tmp_path, object_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _replace(target_path, create):
+    # Create next to the target and rename over it, so an existing target
+    # (which may be linked from the store) is replaced, not written to
+    target_dir = os.path.dirname(target_path)
+    tmp_path = os.path.join(target_dir, '.{0}.{1}.{2}'.format(
+        os.path.basename(target_path), os.getpid(),
+        threading.current_thread().ident))
+    try:
+        create(tmp_path)
+        os.rename(tmp_path, target_path)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _copy(source_path, target_path):
+    try:
+        with open(source_path, 'rb') as source:
+            with open(target_path, 'wb') as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except (IOError, OSError):
+        shutil.copyfile(source_path, target_path)
+    shutil.copystat(source_path, target_path)
+
+
+def _digest(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(BUFSIZE)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
@@ -25,6 +25,7 @@ import time
 import bottle
 import sh
 import requests
+import yaml
 from path import path
 
 import cosmo_tester
@@ -32,6 +33,7 @@ import cloudify.utils
 from cloudify_rest_client.client import DEFAULT_API_VERSION
 from cloudify.proxy.server import get_unused_port
 
+from claw import cfy
 from claw import settings
 from claw import configuration
 
@@ -45,6 +47,56 @@ for logger_name in ('sh', 'requests.packages.urllib3.connectionpool'):
     cloudify.utils.setup_logger(logger_name, logging.WARNING)
 
 
+WORKFLOW_END_EVENTS = {
+    'terminated': 'workflow_succeeded',
+    'failed': 'workflow_failed',
+    'cancelled': 'workflow_cancelled'
+}
+
+
+def execution_routes(status='terminated'):
+    """Mock server routes (see `BaseTest.server`) for getting executions and
+    their events, for executions that ended with `status`."""
+
+    def get_execution(execution_id):
+        return {'id': execution_id,
+                'status': status,
+                'deployment_id': execution_id,
+                'workflow_id': 'install',
+                'error': 'error' if status == 'failed' else ''}
+
+    def list_events():
+        execution_id = bottle.request.query.execution_id
+        events = [{
+            'type': 'cloudify_event',
+            'event_type': WORKFLOW_END_EVENTS[status],
+            '@timestamp': '2016-01-01T00:00:00.000Z',
+            'message': {'text': 'Workflow ended', 'arguments': None},
+            'context': {'deployment_id': execution_id,
+                        'execution_id': execution_id,
+                        'workflow_id': 'install'}
+        }]
+        offset = int(bottle.request.query.get('_offset', 0))
+        return {'items': events[offset:],
+                'metadata': {'pagination': {'total': len(events),
+                                            'size': len(events),
+                                            'offset': offset}}}
+
+    return {
+        'executions/<execution_id>': get_execution,
+        'events': list_events
+    }
+
+
+def manager_routes():
+    """Mock server routes `cfy profiles use` checks the manager with."""
+    return {
+        'version': lambda: {'version': '4.0', 'edition': 'community',
+                            'build': None, 'date': None, 'commit': None},
+        'status': lambda: {'status': 'running', 'services': []}
+    }
+
+
 class BaseTest(unittest.TestCase):
 
     def setUp(self):
@@ -95,6 +147,34 @@ class BaseTest(unittest.TestCase):
         self.addCleanup(lambda: (p.terminate(), p.join()))
         return port
 
+    def use_cli_backend(self, conf, port):
+        """Deploy and undeploy `conf` with `cfy`, against the mock server
+        listening on `port` (the REST client is still used for waiting for
+        executions)."""
+        claw_settings = yaml.safe_load(self.settings_path.text())
+        claw_settings['backend'] = settings.CLI_BACKEND
+        self.settings_path.write_text(yaml.safe_dump(claw_settings))
+        with conf.patch.handler_configuration as patch:
+            patch.obj.update({'manager_ip': 'localhost',
+                              'manager_port': port})
+        if cfy.NEW_CLI:
+            # Keep the cfy profiles in the workdir (inherited by the cfy
+            # processes claw starts)
+            os.environ['CFY_WORKDIR'] = str(self.workdir / 'cfy')
+            self.addCleanup(os.environ.pop, 'CFY_WORKDIR', None)
+            sh.cfy.profiles.use('localhost',
+                                rest_port=port,
+                                manager_username='admin',
+                                manager_password='admin',
+                                manager_tenant='default_tenant')
+        else:
+            from cloudify_cli import utils as cli_utils
+            with conf.dir:
+                sh.cfy.init()
+                with cli_utils.update_wd_settings() as wd_settings:
+                    wd_settings.set_management_server('localhost')
+                    wd_settings.set_rest_port(port)
+
     class ServerHandlerWrapper(object):
 
         def __init__(self, handler):
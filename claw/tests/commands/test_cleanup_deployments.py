@@ -0,0 +1,133 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import json
+import unittest
+
+import bottle
+import sh
+from cloudify_rest_client import CloudifyClient
+
+from claw import configuration
+from claw import tests
+
+TRACKS_DEPENDENCIES = hasattr(CloudifyClient(),
+                              'inter_deployment_dependencies')
+
+
+class CleanupDeploymentsTest(tests.BaseTestWithInit):
+
+    def setUp(self):
+        super(CleanupDeploymentsTest, self).setUp()
+        self.requests_path = self.workdir / 'requests.json'
+        self.claw.generate(tests.STUB_CONFIGURATION)
+        self.conf = configuration.Configuration(tests.STUB_CONFIGURATION)
+
+    @unittest.skipUnless(TRACKS_DEPENDENCIES,
+                         'REST client without inter deployment dependencies')
+    def test_dependencies(self):
+        self._start_server(['db', 'app', 'web', 'other'],
+                           dependencies=[('app', 'db'), ('web', 'app')])
+        self.claw('cleanup-deployments', tests.STUB_CONFIGURATION)
+        requests = json.loads(self.requests_path.text())
+        deleted = [name for kind, name in requests if kind == 'deployment']
+        self.assertEqual(sorted(deleted), ['app', 'db', 'other', 'web'])
+        uninstalled = [name for kind, name in requests if kind == 'uninstall']
+        self.assertLess(deleted.index('web'), uninstalled.index('app'))
+        self.assertLess(deleted.index('app'), uninstalled.index('db'))
+        self.assertEqual(
+            sorted(name for kind, name in requests if kind == 'blueprint'),
+            ['app', 'db', 'other', 'web'])
+
+    def test_cli_backend_prefixed_output(self):
+        port = self._start_server(['dep1', 'dep2'])
+        self.use_cli_backend(self.conf, port)
+        output = self.claw('cleanup-deployments',
+                           tests.STUB_CONFIGURATION).stdout
+        for deployment_id in ['dep1', 'dep2']:
+            self.assertIn('[{0}] '.format(deployment_id), output)
+        requests = json.loads(self.requests_path.text())
+        self.assertEqual(
+            sorted(name for kind, name in requests if kind == 'deployment'),
+            ['dep1', 'dep2'])
+
+    def test_failures(self):
+        self._start_server(['dep1', 'dep2'], failing=['dep1'])
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.claw('cleanup-deployments', tests.STUB_CONFIGURATION)
+        self.assertIn('Failed cleaning 2 of 4 deployments and blueprints',
+                      c.exception.stderr)
+        self.assertIn('deployment dep1:', c.exception.stderr)
+        self.assertIn('blueprint dep1:', c.exception.stderr)
+        self.assertNotIn('[1]', c.exception.stdout)
+        requests = json.loads(self.requests_path.text())
+        self.assertIn(['deployment', 'dep2'], requests)
+        self.assertIn(['blueprint', 'dep2'], requests)
+
+    def _start_server(self, deployments, failing=(), dependencies=()):
+        self.requests_path.write_text('[]')
+
+        def record(kind, name):
+            requests = json.loads(self.requests_path.text())
+            requests.append([kind, name])
+            self.requests_path.write_text(json.dumps(requests))
+
+        def list_response(items):
+            return {'items': items,
+                    'metadata': {'pagination': {'total': len(items),
+                                                'size': len(items),
+                                                'offset': 0}}}
+
+        def start_execution():
+            deployment_id = bottle.request.json['deployment_id']
+            record('uninstall', deployment_id)
+            return bottle.HTTPResponse(
+                body={'id': deployment_id, 'status': 'terminated'},
+                status=201,
+                headers={'content-type': 'application/json'})
+
+        def delete(kind):
+            def handler(name):
+                if name in failing:
+                    return bottle.HTTPResponse(
+                        body={'message': 'failed', 'error_code': 'error'},
+                        status=500,
+                        headers={'content-type': 'application/json'})
+                record(kind, name)
+                return {}
+            return handler
+
+        items = [{'id': d} for d in deployments]
+        dependency_items = [{'source_deployment_id': source,
+                             'target_deployment_id': target}
+                            for source, target in dependencies]
+        routes = tests.execution_routes()
+        routes.update(tests.manager_routes())
+        routes.update({
+            'deployments/inter-dependencies':
+                lambda: list_response(dependency_items),
+            'executions': lambda: list_response([]),
+            'deployments': lambda: list_response(items),
+            'blueprints': lambda: list_response(items),
+            ('executions', 'POST'): start_execution,
+            ('deployments/<name>', 'DELETE'): delete('deployment'),
+            ('blueprints/<name>', 'DELETE'): delete('blueprint')
+        })
+        port = self.server(routes)
+        with self.conf.patch.handler_configuration as patch:
+            patch.obj.update({'manager_ip': 'localhost',
+                              'manager_port': port})
+        return port
@@ -15,13 +15,15 @@
 ############
 
 import json
+import unittest
 
 import bottle
 import sh
+import yaml
 
-from cloudify_cli import utils as cli_utils
-
+from claw import cfy
 from claw import configuration
+from claw import settings
 from claw import tests
 
 
@@ -36,23 +38,80 @@ class DeployTest(tests.BaseTestWithInit):
     def test_reset(self):
         self._test(reset=True)
 
+    @unittest.skipIf(cfy.NEW_CLI, 'Old cfy CLI not installed')
+    def test_cli_backend_old_cli(self):
+        self._test(backend=settings.CLI_BACKEND)
+
+    @unittest.skipIf(cfy.NEW_CLI, 'Old cfy CLI not installed')
+    def test_cli_backend_old_cli_skip_generation(self):
+        self._test(skip_generation=True, backend=settings.CLI_BACKEND)
+
+    @unittest.skipUnless(cfy.NEW_CLI, 'New cfy CLI not installed')
+    def test_cli_backend_new_cli(self):
+        self._test(backend=settings.CLI_BACKEND)
+
+    @unittest.skipUnless(cfy.NEW_CLI, 'New cfy CLI not installed')
+    def test_cli_backend_new_cli_skip_generation(self):
+        self._test(skip_generation=True, backend=settings.CLI_BACKEND)
+
+    def test_failed_execution(self):
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self._test(execution_status='failed')
+        self.assertIn("Execution of workflow 'install'", c.exception.stderr)
+
+    def test_multiple_blueprints(self):
+        other_blueprint = 'other_blueprint'
+        blueprints_yaml = yaml.safe_load(self.settings.blueprints_yaml.text())
+        blueprints = blueprints_yaml['blueprints']
+        blueprints[other_blueprint] = blueprints[tests.STUB_BLUEPRINT]
+        self.settings.blueprints_yaml.write_text(
+            yaml.safe_dump(blueprints_yaml))
+        requests_path = self.workdir / 'requests.json'
+        port = self._start_server(requests_path)
+        self.claw.generate(tests.STUB_CONFIGURATION)
+        conf = configuration.Configuration(tests.STUB_CONFIGURATION)
+        with conf.patch.handler_configuration as patch:
+            patch.obj.update({'manager_ip': 'localhost',
+                              'manager_port': port})
+        output = self.claw.deploy(tests.STUB_CONFIGURATION,
+                                  tests.STUB_BLUEPRINT, other_blueprint,
+                                  jobs=2).stdout
+        self.assertIn('Deployed 2 of 2 blueprints', output)
+        requests = json.loads(requests_path.text())
+        uploaded = sorted(r['blueprint'][0] for r in requests
+                          if 'blueprint' in r)
+        self.assertEqual(uploaded, sorted([tests.STUB_BLUEPRINT,
+                                           other_blueprint]))
+        for blueprint in [tests.STUB_BLUEPRINT, other_blueprint]:
+            log_path = conf.logs_dir / 'deploy-{0}.log'.format(blueprint)
+            self.assertIn(log_path, output)
+            self.assertIn("Finished executing workflow 'install'",
+                          log_path.text())
+            self.assertIn('[{0}] '.format(blueprint), output)
+            events_path = conf.logs_dir / 'events' / '{0}.jsonl'.format(
+                blueprint)
+            event = json.loads(events_path.lines()[0])
+            self.assertEqual(event['event_type'], 'workflow_succeeded')
+
     def test_no_configuration(self):
         with self.assertRaises(sh.ErrorReturnCode) as c:
             self.claw.deploy(tests.STUB_CONFIGURATION, tests.STUB_BLUEPRINT)
         self.assertIn('Not initialized', c.exception.stderr)
 
-    def _test(self, skip_generation=False, reset=False):
+    def _test(self, skip_generation=False, reset=False,
+              backend=settings.REST_BACKEND, execution_status='terminated'):
         requests_path = self.workdir / 'requests.json'
-        port = self._start_server(requests_path)
+        port = self._start_server(requests_path, execution_status)
 
         self.claw.generate(tests.STUB_CONFIGURATION)
         conf = configuration.Configuration(tests.STUB_CONFIGURATION)
 
-        with conf.dir:
-            sh.cfy.init()
-            with cli_utils.update_wd_settings() as wd_settings:
-                wd_settings.set_management_server('localhost')
-                wd_settings.set_rest_port(port)
+        if backend == settings.CLI_BACKEND:
+            self.use_cli_backend(conf, port)
+        else:
+            with conf.patch.handler_configuration as patch:
+                patch.obj.update({'manager_ip': 'localhost',
+                                  'manager_port': port})
 
         blueprint_conf = conf.blueprint(tests.STUB_BLUEPRINT)
 
@@ -95,7 +154,7 @@ class DeployTest(tests.BaseTestWithInit):
                 'force': 'false'
             }]})
 
-    def _start_server(self, requests_path):
+    def _start_server(self, requests_path, execution_status='terminated'):
         requests_path.write_text('[]')
 
         def response(body=None, request=None):
@@ -115,11 +174,18 @@ class DeployTest(tests.BaseTestWithInit):
                 request={'deployment': [deployment_id, bottle.request.json]})
 
         def start_execution():
-            return response({'status': 'terminated'},
+            deployment_id = bottle.request.json['deployment_id']
+            return response({'id': deployment_id,
+                             'status': execution_status,
+                             'deployment_id': deployment_id,
+                             'error': 'error'},
                             request={'execution': [bottle.request.json]})
 
-        return self.server({
+        routes = tests.execution_routes(execution_status)
+        routes.update(tests.manager_routes())
+        routes.update({
             ('blueprints/<blueprint_id>', 'PUT'): upload_blueprint,
             ('deployments/<deployment_id>', 'PUT'): create_deployment,
             ('executions', 'POST'): start_execution
         })
+        return self.server(routes)
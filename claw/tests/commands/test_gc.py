@@ -0,0 +1,84 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import os
+import shutil
+import stat
+
+import yaml
+
+from claw import patcher
+from claw import tests
+
+
+class GcTest(tests.BaseTestWithInit):
+
+    def setUp(self):
+        super(GcTest, self).setUp()
+        blueprint_dir = self.workdir / 'blueprint'
+        blueprint_dir.mkdir_p()
+        (blueprint_dir / 'blueprint.yaml').write_text(
+            yaml.safe_dump({'some': 'blueprint'}))
+        (blueprint_dir / 'script.sh').write_text('script')
+        (blueprint_dir / 'config.json').write_text('{"key": "value"}')
+        (blueprint_dir / 'config.yaml').write_text('key: value\n')
+        self.settings.user_suites_yaml.write_text(yaml.safe_dump({
+            'handler_configurations': dict(
+                (conf, {'manager_blueprint': str(blueprint_dir /
+                                                 'blueprint.yaml')})
+                for conf in ['conf1', 'conf2'])
+        }))
+
+    def test_shared_files(self):
+        self.claw.generate('conf1')
+        self.claw.generate('conf2')
+        script1 = os.stat(self._script_path('conf1'))
+        script2 = os.stat(self._script_path('conf2'))
+        self.assertEqual(script1.st_ino, script2.st_ino)
+        self.assertFalse(script1.st_mode & stat.S_IWUSR)
+        self.assertEqual('script', self._script_path('conf1').text())
+
+    def test_patch_shared_files(self):
+        self.claw.generate('conf1')
+        self.claw.generate('conf2')
+        for name, is_json in [('config.json', True), ('config.yaml', False)]:
+            with patcher.YamlPatcher(self._path('conf1', name),
+                                     is_json=is_json) as patch:
+                patch.set_value('key', 'changed')
+            self.assertEqual(
+                yaml.safe_load(self._path('conf1', name).text()),
+                {'key': 'changed'})
+            self.assertEqual(
+                yaml.safe_load(self._path('conf2', name).text()),
+                {'key': 'value'})
+
+    def test_gc(self):
+        self.claw.generate('conf1')
+        self.claw.generate('conf2')
+        self.assertIn('Removed 0 files', self.claw.gc().stdout)
+        shutil.rmtree(self.settings.configurations / 'conf1')
+        self.assertIn('Removed 0 files', self.claw.gc().stdout)
+        shutil.rmtree(self.settings.configurations / 'conf2')
+        self.assertIn('Removed 1 files', self.claw.gc().stdout)
+        self.claw.generate('conf1')
+        self.assertEqual('script', self._script_path('conf1').text())
+
+    def _script_path(self, configuration):
+        return self._path(configuration, 'script.sh')
+
+    def _path(self, configuration, name):
+        return (self.settings.configurations / configuration /
+                'manager-blueprint' / name)
@@ -14,9 +14,15 @@
 # limitations under the License.
 ############
 
+import os
+import time
+
+import mock
 import sh
 import yaml
 
+from claw import commands
+from claw import settings
 from claw import tests
 
 
@@ -126,6 +132,69 @@ class GenerateTest(tests.BaseTestWithInit):
         with config_dir:
             self._test(reset=True)
 
+    def test_existing_configuration_reset_incremental(self):
+        config_dir = self._test()
+        blueprint_path = self.workdir / 'blueprint' / 'some-manager-blueprint.yaml'  # noqa
+        new_blueprint_path = (config_dir / 'manager-blueprint' /
+                              'manager-blueprint.yaml')
+        bootstrap_state_dir = config_dir / '.cloudify'
+        self._age(blueprint_path)
+        self.claw.generate('conf1', reset=True)
+        mtime = new_blueprint_path.mtime
+        bootstrap_state_dir.mkdir()
+        self.claw.generate('conf1', reset=True)
+        self.assertEqual(mtime, new_blueprint_path.mtime)
+        self.assertFalse(bootstrap_state_dir.exists())
+        blueprint_path.write_text(yaml.safe_dump({'changed': 'blueprint'}))
+        self._age(blueprint_path)
+        self.claw.generate('conf1', reset=True)
+        self.assertEqual({'changed': 'blueprint'},
+                         yaml.safe_load(new_blueprint_path.text()))
+
+    def test_multiple_configurations(self):
+        configurations = ['conf1', 'conf2', 'other']
+        self._write_suites_yaml(configurations)
+        self.claw.generate('conf*', 'other', jobs=2)
+        for configuration in configurations:
+            self.assertEqual({'name': configuration}, yaml.safe_load(
+                (self.settings.configurations / configuration /
+                 'inputs.yaml').text()))
+        self.assertEqual('other',
+                         (self.settings.configurations / '_').readlink())
+
+    def test_multiple_configurations_parse_suites_yaml_once(self):
+        self._write_suites_yaml(['conf1', 'conf2'])
+        # Reloaded from this test's settings file
+        with mock.patch.object(settings.settings, '_settings', None):
+            with mock.patch.object(
+                    settings.settings, 'load_suites_yaml',
+                    wraps=settings.settings.load_suites_yaml) as load:
+                commands.generate(['conf1', 'conf2'], jobs=1)
+        self.assertEqual(load.call_count, 1)
+        for configuration in ['conf1', 'conf2']:
+            self.assertEqual({'name': configuration}, yaml.safe_load(
+                (self.settings.configurations / configuration /
+                 'inputs.yaml').text()))
+
+    def test_all_configurations(self):
+        self._write_suites_yaml(['conf1', 'conf2'], broken=['broken'])
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.claw.generate(all=True)
+        self.assertIn('Failed generating 1 configurations', c.exception.stderr)
+        self.assertIn('broken', c.exception.stderr)
+        self.assertIn('Generated 2 of 3 configurations', c.exception.stdout)
+        for configuration in ['conf1', 'conf2']:
+            self.assertTrue((self.settings.configurations / configuration /
+                             'inputs.yaml').exists())
+        self.assertEqual('conf2',
+                         (self.settings.configurations / '_').readlink())
+
+    def test_no_matching_configuration(self):
+        self._write_suites_yaml(['conf1'])
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.claw.generate('other*')
+        self.assertIn('No configuration matches other*', c.exception.stderr)
+
     def test_existing_current_configuration(self):
         self._test()
         self._test(configuration='some_other_conf')
@@ -218,3 +287,24 @@ class GenerateTest(tests.BaseTestWithInit):
         self.assertEqual((self.workdir / 'configurations' / '_').readlink(),
                          configuration)
         return config_dir
+
+    def _write_suites_yaml(self, configurations, broken=()):
+        blueprint_path = self.workdir / 'blueprint' / 'blueprint.yaml'
+        blueprint_path.dirname().mkdir_p()
+        blueprint_path.write_text(yaml.safe_dump({'some': 'blueprint'}))
+        handler_configurations = dict(
+            (configuration, {'manager_blueprint': str(blueprint_path),
+                             'inputs_override': {'name': configuration}})
+            for configuration in configurations)
+        handler_configurations.update(
+            (configuration, {'manager_blueprint': str(
+                self.workdir / 'no-such-blueprint' / 'blueprint.yaml')})
+            for configuration in broken)
+        self.settings.user_suites_yaml.write_text(yaml.safe_dump({
+            'handler_configurations': handler_configurations}))
+
+    @staticmethod
+    def _age(file_path):
+        # Files modified too recently are not fingerprinted
+        past = time.time() - 60
+        os.utime(file_path, (past, past))
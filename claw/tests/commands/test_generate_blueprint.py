@@ -81,6 +81,28 @@ class GenerateBlueprintTest(tests.BaseTest):
         self._test()
         self._test(reset=True, skip_conf_generate=True)
 
+    def test_multiple_blueprints(self):
+        self._test()
+        blueprints_yaml = yaml.safe_load(self.settings.blueprints_yaml.text())
+        blueprints = blueprints_yaml['blueprints']
+        for name in ['blueprint2', 'other']:
+            blueprints[name] = dict(blueprints['blueprint1'],
+                                    inputs_override={'name': name})
+        blueprints['broken'] = {'blueprint': str(
+            self.workdir / 'no-such-blueprint' / 'blueprint.yaml')}
+        self.settings.blueprints_yaml.write_text(
+            yaml.safe_dump(blueprints_yaml))
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.claw('generate-blueprint', 'conf1', 'blueprint2', 'oth*',
+                      'broken', jobs=2)
+        self.assertIn('Generated 2 of 3 blueprints', c.exception.stdout)
+        self.assertIn('Failed generating 1 blueprints', c.exception.stderr)
+        self.assertIn('broken', c.exception.stderr)
+        blueprints_dir = configuration.Configuration('conf1').blueprints_dir
+        for name in ['blueprint2', 'other']:
+            self.assertEqual({'name': name}, yaml.safe_load(
+                (blueprints_dir / name / 'inputs.yaml').text()))
+
     def test_no_configuration(self):
         self.init()
         with self.assertRaises(sh.ErrorReturnCode) as c:
@@ -14,7 +14,11 @@
 # limitations under the License.
 ############
 
+import imp
 import json
+import marshal
+import os
+import time
 import uuid
 
 import sh
@@ -155,6 +159,26 @@ def script():
         self.assertIn(expected_in, output)
         self.assertNotIn(expected_out, output)
 
+    def test_compiled_code_cache(self):
+        script_path = self.workdir / 'script.py'
+        script_path.write_text("def script(): print 'ORIGINAL'")
+        past = time.time() - 60
+        os.utime(script_path, (past, past))
+        self.assertEqual('ORIGINAL', self._run(script_path))
+        cache_files = self.settings.cache_dir.files('code-*.pyc')
+        self.assertEqual(1, len(cache_files))
+        magic = imp.get_magic()
+        key, _ = marshal.loads(cache_files[0].bytes()[len(magic):])
+        code = compile("def script(): print 'CACHED'", script_path, 'exec')
+        cache_files[0].write_bytes(magic + marshal.dumps((key, code)))
+        self.assertEqual('CACHED', self._run(script_path))
+        script_path.write_text("def script(): print 'MODIFIED'")
+        self.assertEqual('MODIFIED', self._run(script_path))
+
+    def _run(self, script_path):
+        return self.claw.script(tests.STUB_CONFIGURATION,
+                                script_path).stdout.strip()
+
     def _test(self,
               script,
               args=None,
@@ -14,7 +14,10 @@
 # limitations under the License.
 ############
 
+import json
+
 import sh
+import yaml
 
 from claw import configuration
 from claw import tests
@@ -33,6 +36,60 @@ class StatusTest(tests.BaseTestWithInit):
         output = self.claw.status(tests.STUB_CONFIGURATION).stdout
         self.assertIn(test_version, output)
 
+    def test_all(self):
+        port = self.server({'version': lambda: {'version': 'TEST_VERSION'}})
+        self._bootstrapped('conf1', 'localhost', port)
+        self._bootstrapped('conf2', '127.0.0.1', 1)
+        self._bootstrapped('conf3')
+        output = self.claw.status(all=True).stdout
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('CONFIGURATION', lines[0])
+        self.assertIn('conf1', lines[1])
+        self.assertIn('running', lines[1])
+        self.assertIn('TEST_VERSION', lines[1])
+        self.assertIn('conf2', lines[2])
+        self.assertIn('not reachable', lines[2])
+
+    def test_all_json(self):
+        port = self.server({'version': lambda: {'version': 'TEST_VERSION'}})
+        self._bootstrapped('conf1', 'localhost', port)
+        self._bootstrapped('conf2', '127.0.0.1', 1)
+        conf1, conf2 = json.loads(self.claw.status(all=True,
+                                                   json=True).stdout)
+        self.assertEqual(conf1['configuration'], 'conf1')
+        self.assertTrue(conf1['reachable'])
+        self.assertEqual(conf1['version'], 'TEST_VERSION')
+        self.assertGreater(conf1['latency'], 0)
+        self.assertEqual(conf2['configuration'], 'conf2')
+        self.assertFalse(conf2['reachable'])
+        self.assertIsNone(conf2['latency'])
+        self.assertTrue(conf2['error'])
+
+    def test_all_cached(self):
+        count_path = self.workdir / 'count'
+        count_path.write_text('0')
+
+        def version():
+            count_path.write_text(str(int(count_path.text()) + 1))
+            return {'version': 'TEST_VERSION'}
+        port = self.server({'version': version})
+        conf = self._bootstrapped('conf1', 'localhost', port)
+        self.assertIn('running', self.claw.status(all=True).stdout)
+        self.assertIn('running', self.claw.status(all=True).stdout)
+        self.assertEqual(count_path.text(), '1')
+        self.assertIn('running',
+                      self.claw.status(all=True, max_age=0).stdout)
+        self.assertEqual(count_path.text(), '2')
+        with conf.patch.handler_configuration as patch:
+            patch.set_value('manager_port', 1)
+        self.assertIn('not reachable', self.claw.status(all=True).stdout)
+
+    def test_configuration_or_all(self):
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.claw.status()
+        self.assertIn('Pass a configuration or --all', c.exception.stderr)
+
     def test_no_configuration(self):
         with self.assertRaises(sh.ErrorReturnCode) as c:
             self.claw.status(tests.STUB_CONFIGURATION)
@@ -54,3 +111,18 @@ class StatusTest(tests.BaseTestWithInit):
             self.claw.status(tests.STUB_CONFIGURATION)
         self.assertIn('Not reachable', c.exception.stderr)
         self.assertIn(ip, c.exception.stderr)
+
+    def _bootstrapped(self, name, manager_ip=None, manager_port=None):
+        suites_yaml = self.settings.load_suites_yaml(variables=False)
+        handler_configurations = suites_yaml['handler_configurations']
+        handler_configurations[name] = handler_configurations[
+            tests.STUB_CONFIGURATION]
+        self.settings.user_suites_yaml.write_text(
+            yaml.safe_dump(suites_yaml))
+        self.claw.generate(name)
+        conf = configuration.Configuration(name)
+        if manager_ip:
+            with conf.patch.handler_configuration as patch:
+                patch.obj.update({'manager_ip': manager_ip,
+                                  'manager_port': manager_port})
+        return conf
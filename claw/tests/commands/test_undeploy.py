@@ -0,0 +1,106 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import json
+import unittest
+
+import bottle
+import sh
+
+from claw import cfy
+from claw import configuration
+from claw import tests
+
+
+class UndeployTest(tests.BaseTestWithInit):
+
+    def test_basic(self):
+        self._test()
+
+    @unittest.skipIf(cfy.NEW_CLI, 'Old cfy CLI not installed')
+    def test_cli_backend_old_cli(self):
+        self._test(cli_backend=True)
+
+    @unittest.skipUnless(cfy.NEW_CLI, 'New cfy CLI not installed')
+    def test_cli_backend_new_cli(self):
+        self._test(cli_backend=True)
+
+    def test_no_configuration(self):
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.claw.undeploy(tests.STUB_CONFIGURATION,
+                               tests.STUB_BLUEPRINT)
+        self.assertIn('Not initialized', c.exception.stderr)
+
+    def _test(self, cli_backend=False):
+        requests_path = self.workdir / 'requests.json'
+        port = self._start_server(requests_path)
+        self.claw.generate(tests.STUB_CONFIGURATION)
+        conf = configuration.Configuration(tests.STUB_CONFIGURATION)
+        if cli_backend:
+            self.use_cli_backend(conf, port)
+        else:
+            with conf.patch.handler_configuration as patch:
+                patch.obj.update({'manager_ip': 'localhost',
+                                  'manager_port': port})
+        self.claw.undeploy(tests.STUB_CONFIGURATION, tests.STUB_BLUEPRINT)
+        execution, deployment, blueprint = json.loads(requests_path.text())
+        self.assertEqual(execution['execution'][0]['workflow_id'],
+                         'uninstall')
+        self.assertEqual(execution['execution'][0]['deployment_id'],
+                         tests.STUB_BLUEPRINT)
+        self.assertEqual(deployment, {
+            'deployment': [tests.STUB_BLUEPRINT, 'true']})
+        self.assertEqual(blueprint, {'blueprint': [tests.STUB_BLUEPRINT]})
+
+    def _start_server(self, requests_path):
+        requests_path.write_text('[]')
+
+        def record(request):
+            requests = json.loads(requests_path.text())
+            requests.append(request)
+            requests_path.write_text(json.dumps(requests))
+
+        def list_executions():
+            return {'items': [],
+                    'metadata': {'pagination': {'total': 0,
+                                                'size': 0,
+                                                'offset': 0}}}
+
+        def start_execution():
+            record({'execution': [bottle.request.json]})
+            return bottle.HTTPResponse(
+                body={'id': tests.STUB_BLUEPRINT, 'status': 'terminated'},
+                status=201,
+                headers={'content-type': 'application/json'})
+
+        def delete_deployment(deployment_id):
+            record({'deployment': [
+                deployment_id, bottle.request.query.ignore_live_nodes]})
+            return {}
+
+        def delete_blueprint(blueprint_id):
+            record({'blueprint': [blueprint_id]})
+            return {}
+
+        routes = tests.execution_routes()
+        routes.update(tests.manager_routes())
+        routes.update({
+            'executions': list_executions,
+            ('executions', 'POST'): start_execution,
+            ('deployments/<deployment_id>', 'DELETE'): delete_deployment,
+            ('blueprints/<blueprint_id>', 'DELETE'): delete_blueprint
+        })
+        return self.server(routes)
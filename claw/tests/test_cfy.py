@@ -0,0 +1,65 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import mock
+
+from claw import cfy
+from claw import tests
+
+
+class CfyTest(tests.BaseTest):
+
+    def test_new_cli(self):
+        command = self._run(new_cli=True)
+        command.blueprints.upload.assert_called_once_with(
+            'blueprint.yaml', blueprint_id='bp')
+        command.deployments.create.assert_called_once_with(
+            'dep', blueprint_id='bp', inputs='inputs.yaml')
+        command.executions.start.assert_called_once_with(
+            'install', deployment_id='dep', no_logs=False, timeout=10)
+        command.deployments.delete.assert_called_once_with('dep', force=True)
+        command.blueprints.delete.assert_called_once_with('bp')
+
+    def test_old_cli(self):
+        command = self._run(new_cli=False)
+        command.blueprints.upload.assert_called_once_with(
+            blueprint_path='blueprint.yaml', blueprint_id='bp')
+        command.deployments.create.assert_called_once_with(
+            deployment_id='dep', blueprint_id='bp', inputs='inputs.yaml')
+        command.executions.start.assert_called_once_with(
+            workflow='install', deployment_id='dep', include_logs=True,
+            timeout=10)
+        command.deployments.delete.assert_called_once_with(
+            deployment_id='dep', ignore_live_nodes=True)
+        command.blueprints.delete.assert_called_once_with(blueprint_id='bp')
+
+    def _run(self, new_cli):
+        command = mock.MagicMock()
+        with mock.patch.object(cfy, 'NEW_CLI', new_cli):
+            with mock.patch.object(cfy, 'cfy', command):
+                cfy.blueprints_upload(blueprint_path='blueprint.yaml',
+                                      blueprint_id='bp')
+                cfy.deployments_create(blueprint_id='bp',
+                                       deployment_id='dep',
+                                       inputs='inputs.yaml')
+                cfy.executions_start(workflow='install',
+                                     deployment_id='dep',
+                                     include_logs=True,
+                                     timeout=10)
+                cfy.deployments_delete(deployment_id='dep',
+                                       ignore_live_nodes=True)
+                cfy.blueprints_delete(blueprint_id='bp')
+        return command
@@ -14,12 +14,16 @@
 # limitations under the License.
 ############
 
+import json
+import os
+import time
 import uuid
 
 import sh
 
 from claw import patcher
 from claw import commands
+from claw import completion
 from claw import tests
 
 
@@ -95,6 +99,8 @@ class TestCompletion(tests.BaseTest):
             '-b', '--manager-blueprint-override']
         if command != 'cleanup':
             expected += ['-r', '--reset']
+        if command == 'generate':
+            expected += ['-a', '--all', '-j', '--jobs']
         expected += self.help_args
         self.assert_completion(expected=expected,
                                args=[command])
@@ -110,25 +116,28 @@ class TestCompletion(tests.BaseTest):
                                    args=[command, arg])
 
     def test_status(self):
-        self._test_status_and_teardown('status')
+        self._test_status_and_teardown('status', ['-a', '--all', '--json',
+                                                  '-m', '--max-age'])
 
     def test_teardown(self):
         self._test_status_and_teardown('teardown')
 
-    def _test_status_and_teardown(self, command):
+    def _test_status_and_teardown(self, command, options=()):
         self._prepare_existing_configurations()
-        expected = self.existing_configurations + self.help_args
+        expected = (self.existing_configurations + self.help_args +
+                    list(options))
         self.assert_completion(expected=expected,
                                args=[command])
 
     def test_generate_blueprint(self):
-        options = self.help_args + ['-r', '--reset']
+        options = self.help_args + ['-r', '--reset', '-j', '--jobs']
         self._test_generate_blueprint_and_deploy('generate-blueprint', options)
 
     def test_deploy(self):
         options = self.help_args + ['-r', '--reset',
                                     '-s', '--skip-generation',
-                                    '-t', '--timeout']
+                                    '-t', '--timeout',
+                                    '-j', '--jobs']
         self._test_generate_blueprint_and_deploy('deploy', options)
 
     def _test_generate_blueprint_and_deploy(self, command, options):
@@ -153,7 +162,7 @@ class TestCompletion(tests.BaseTest):
 
     def test_cleanup_deployments(self):
         self._prepare_existing_configurations()
-        options = self.help_args + ['--cancel-executions']
+        options = self.help_args + ['--cancel-executions', '-j', '--jobs']
         expected = self.existing_configurations + options
         self.assert_completion(expected=expected,
                                args=['cleanup-deployments'])
@@ -174,15 +183,73 @@ class TestCompletion(tests.BaseTest):
                                args=['generate-script'],
                                filter_non_options=True)
 
+    def test_cached_completion(self):
+        self._age_claw_home()
+        expected = self.configurations + [
+            '-a', '--all',
+            '-i', '--inputs-override',
+            '-b', '--manager-blueprint-override',
+            '-r', '--reset',
+            '-j', '--jobs'] + self.help_args
+        self.assert_completion(expected=expected, args=['generate'])
+        cache_path = self.settings.cache_dir / completion.CACHE_NAME
+        index = json.loads(cache_path.text())
+        self.assertFalse(index['racy'])
+        index['configurations'].append('cached_conf')
+        cache_path.write_text(json.dumps(index))
+        self.assert_completion(expected=expected + ['cached_conf'],
+                               args=['generate'])
+        self.assert_completion(expected=['cached_conf'],
+                               args=['generate'], prefix='cached_')
+        # option values are not answered from the cache
+        self.assert_completion(expected=self.inputs_templates,
+                               args=['generate', '-i'])
+        with patcher.YamlPatcher(self.settings.user_suites_yaml) as patch:
+            patch.obj['handler_configurations']['conf4'] = {}
+        self.assert_completion(expected=expected + ['conf4'],
+                               args=['generate'])
+
+    def test_cached_completion_repeated_positional(self):
+        self._age_claw_home()
+        expected = self.configurations + [
+            '-a', '--all',
+            '-i', '--inputs-override',
+            '-b', '--manager-blueprint-override',
+            '-r', '--reset',
+            '-j', '--jobs'] + self.help_args
+        self.assert_completion(expected=expected, args=['generate'])
+        # Only completed from the cache, so only answered if the parser is
+        # not built
+        cache_path = self.settings.cache_dir / completion.CACHE_NAME
+        index = json.loads(cache_path.text())
+        dict(index['parser']['commands'])['generate']['options'].append(
+            '--cached')
+        cache_path.write_text(json.dumps(index))
+        expected.append('--cached')
+        self.assert_completion(expected=expected, args=['generate'])
+        self.assert_completion(expected=expected,
+                               args=['generate', self.configurations[0]])
+
+    def _age_claw_home(self):
+        past = time.time() - 60
+        paths = [self.settings.settings_path,
+                 self.settings.user_suites_yaml,
+                 self.settings.blueprints_yaml,
+                 self.scripts_dir, self.scripts_dir2]
+        if self.settings.configurations.exists():
+            paths.append(self.settings.configurations)
+        for p in paths:
+            os.utime(p, (past, past))
+
     def _prepare_existing_configurations(self):
         self.existing_configurations = list(self.configurations)[:2]
         for conf in self.existing_configurations:
             self.claw.generate(conf)
 
     def assert_completion(self, expected, args=None,
-                          filter_non_options=False):
-        args = args or []
-        args += ["''"]
+                          filter_non_options=False, prefix="''"):
+        args = list(args or [])
+        args += [prefix]
         cmd = ['claw'] + list(args)
         partial_word = cmd[-1]
         cmdline = ' '.join(cmd)
@@ -14,15 +14,21 @@
 # limitations under the License.
 ############
 
+import cPickle
+import datetime
 import logging
 import os
+import time
 
 import yaml
 import fabric.api
+from mock import patch
 from path import path
 
 from claw import configuration
+from claw import rest_client
 from claw import tests
+from claw import yaml_io
 from claw.handlers import stub_handler
 
 
@@ -122,6 +128,27 @@ class TestConfiguration(tests.BaseTest):
         assert_files(conf, configuration_files)
         assert_files(blueprint, blueprint_files)
 
+    def test_yaml_files_are_parsed_once(self):
+        conf, blueprint = self._init_configuration_and_blueprint()
+        self.assertTrue(conf.exists())
+        with patch('yaml.load', wraps=yaml.load) as load:
+            conf.handler_configuration = {'a': 1}
+            for _ in range(3):
+                self.assertEqual(conf.handler_configuration, {'a': 1})
+            conf.handler_configuration['a'] = 2
+            self.assertEqual(conf.handler_configuration, {'a': 1})
+            with conf.patch.handler_configuration as handler_patch:
+                handler_patch.obj['b'] = 2
+            blueprint.inputs = {'c': 3}
+            for _ in range(3):
+                self.assertEqual(conf.handler_configuration,
+                                 {'a': 1, 'b': 2})
+                self.assertEqual(blueprint.inputs, {'c': 3})
+            self.assertEqual(0, load.call_count)
+            conf.handler_configuration_path.write_text('{a: 3, b: 4}')
+            self.assertEqual(conf.handler_configuration, {'a': 3, 'b': 4})
+            self.assertEqual(1, load.call_count)
+
     def test_properties(self):
         props_name = 'props1'
         main_suites_yaml_path = self.workdir / 'main-suites.yaml'
@@ -149,6 +176,55 @@ class TestConfiguration(tests.BaseTest):
             'b': 'b_val'
         })
 
+    def test_properties_cache(self):
+        main_suites_yaml_path = self.workdir / 'main-suites.yaml'
+        main_suites_yaml_path.write_text(yaml.safe_dump({
+            'variables': {'a': '123'},
+            'handler_properties': {'props1': {'a_from_var': '{{a}}'}}
+        }))
+        past = time.time() - 60
+        os.utime(main_suites_yaml_path, (past, past))
+        conf = self._init_configuration(main_suites_yaml_path)
+        with conf.patch.handler_configuration as patch:
+            patch.obj['properties'] = 'props1'
+        self.assertEqual(conf.properties, {'a_from_var': '123'})
+        cache_path = self.settings.cache_dir / (
+            'properties-{0}.pickle'.format(tests.STUB_CONFIGURATION))
+        key, _ = cPickle.loads(cache_path.bytes())
+        cache_path.write_bytes(cPickle.dumps(
+            (key, {'a_from_var': 'CACHED'})))
+        self.assertEqual(conf.properties, {'a_from_var': 'CACHED'})
+        main_suites_yaml_path.write_text(yaml.safe_dump({
+            'variables': {'a': '456'},
+            'handler_properties': {'props1': {'a_from_var': '{{a}}'}}
+        }))
+        self.assertEqual(conf.properties, {'a_from_var': '456'})
+
+    def test_properties_cache_types(self):
+        main_suites_yaml_path = self.workdir / 'main-suites.yaml'
+        main_suites_yaml_path.write_text(
+            'handler_properties:\n'
+            '  props1:\n'
+            '    date: 2016-01-01\n'
+            '    ints: {1: one, 2: two}\n'
+            '    text: value\n')
+        past = time.time() - 60
+        os.utime(main_suites_yaml_path, (past, past))
+        conf = self._init_configuration(main_suites_yaml_path)
+        with conf.patch.handler_configuration as patch:
+            patch.obj['properties'] = 'props1'
+        expected = {'date': datetime.date(2016, 1, 1),
+                    'ints': {1: 'one', 2: 'two'},
+                    'text': 'value'}
+        missed = conf.properties
+        cached = conf.properties
+        self.assertEqual(missed, expected)
+        self.assertEqual(cached, expected)
+        self.assertIs(type(cached['text']), type(missed['text']))
+        self.assertEqual(
+            [f for f in self.settings.cache_dir.files()
+             if f.basename().startswith('.properties')], [])
+
     def test_client(self):
         conf = self._init_configuration()
         self.assertEqual(conf.client._client.host, 'localhost')
@@ -164,6 +240,43 @@ class TestConfiguration(tests.BaseTest):
         self.assertEqual(conf.client._client.host, ip)
         self.assertEqual(conf.client._client.port, custom_port)
 
+    def test_client_cached(self):
+        conf = self._init_configuration()
+        client = conf.client
+        self.assertIs(client, conf.client)
+        self.assertEqual(client.timeout, (10, None))
+        self.assertIs(client, configuration.Configuration(
+            tests.STUB_CONFIGURATION).client)
+        with conf.patch.handler_configuration as patch:
+            patch.obj['rest_read_timeout'] = 5
+        self.assertIsNot(client, conf.client)
+        self.assertEqual(conf.client.timeout, (10, 5))
+
+    def test_client_requests(self):
+        port = self.server({'version': lambda: {'version': '1'}})
+        conf = self._init_configuration()
+        with conf.patch.handler_configuration as patch:
+            patch.obj['manager_port'] = port
+        for _ in range(3):
+            self.assertEqual(conf.client.manager.get_version()['version'],
+                             '1')
+        self.assertEqual(conf.client.latency.count, 3)
+        self.assertEqual(sum(conf.client.latency.counts), 3)
+        self.assertIsNotNone(conf.client.latency.percentile(50))
+        self.assertIs(conf.client.blueprints.api, conf.client._client)
+        self.assertIs(conf.client.deployments.outputs.api,
+                      conf.client._client)
+
+    def test_client_options(self):
+        client = rest_client.Client('localhost', 443, protocol='https',
+                                    headers={'Authorization': 'token'},
+                                    trust_all=True)
+        self.assertTrue(
+            client._client.url.startswith('https://localhost:443/'))
+        self.assertEqual(client._client.headers['Authorization'], 'token')
+        self.assertTrue(client._client.trust_all)
+        self.assertIs(client.deployments.outputs.api, client._client)
+
     def test_claw_handler(self):
         conf = self._init_configuration()
         with conf.patch.handler_configuration as patch:
@@ -192,6 +305,42 @@ class TestConfiguration(tests.BaseTest):
                                      'blueprint',
                                      'blueprint_configuration'])
 
+    def test_transaction(self):
+        conf, blueprint = self._init_configuration_and_blueprint()
+        conf.handler_configuration = {'a': 1}
+        with patch.object(yaml_io, 'dump_file',
+                          wraps=yaml_io.dump_file) as dump_file:
+            with conf.transaction():
+                with conf.patch.handler_configuration as handler_patch:
+                    handler_patch.set_value('b', 2)
+                with conf.patch.handler_configuration as handler_patch:
+                    handler_patch.set_value('c.d', 3)
+                conf.inputs = {'e': 4}
+                with conf.patch.inputs as inputs_patch:
+                    inputs_patch.obj['f'] = 5
+                with blueprint.transaction():
+                    with blueprint.patch.inputs as inputs_patch:
+                        inputs_patch.obj['g'] = 6
+                self.assertEqual(conf.handler_configuration,
+                                 {'a': 1, 'b': 2, 'c': {'d': 3}})
+                self.assertEqual(
+                    yaml.safe_load(conf.handler_configuration_path.text()),
+                    {'a': 1})
+                self.assertEqual(0, dump_file.call_count)
+            self.assertEqual(3, dump_file.call_count)
+        new_conf = configuration.Configuration(tests.STUB_CONFIGURATION)
+        self.assertEqual(new_conf.handler_configuration,
+                         {'a': 1, 'b': 2, 'c': {'d': 3}})
+        self.assertEqual(new_conf.inputs, {'e': 4, 'f': 5})
+        self.assertEqual(new_conf.blueprint(tests.STUB_BLUEPRINT).inputs['g'],
+                         6)
+        with self.assertRaises(RuntimeError):
+            with conf.transaction():
+                conf.inputs = {}
+                raise RuntimeError()
+        self.assertEqual(conf.inputs, {'e': 4, 'f': 5})
+        self.assertEqual([], conf.dir.files('.*'))
+
     def test_ssh(self):
         conf = self._init_configuration()
         ip = '1.1.1.1'
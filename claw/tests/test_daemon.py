@@ -0,0 +1,105 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import os
+import time
+
+import sh
+
+from claw import daemon
+from claw import settings
+from claw import tests
+
+
+SCRIPT = '''
+import sys
+def script(arg):
+    sys.stdout.write(arg + ':' + sys.stdin.read())
+    sys.stderr.write('ERROR')
+    sys.exit(3)
+'''
+
+
+class DaemonTest(tests.BaseTestWithInit):
+
+    def setUp(self):
+        super(DaemonTest, self).setUp()
+        self.socket_path = self.workdir / 'daemon.sock'
+        os.environ[daemon.SOCKET_PATH_ENV] = str(self.socket_path)
+        self.addCleanup(lambda: os.environ.pop(daemon.SOCKET_PATH_ENV, None))
+        self.client = sh.Command('claw-client')
+
+    def test_no_daemon(self):
+        self.assertFalse(self.socket_path.exists())
+        self.assertEqual(self.claw('--help').stdout,
+                         self.client('--help').stdout)
+
+    def test_daemon(self):
+        self._start_daemon()
+        self.assertEqual(self.claw('--help').stdout,
+                         self.client('--help').stdout)
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.client.status('no_such_configuration')
+        self.assertEqual(c.exception.exit_code, 1)
+        self.assertIn('error: Not initialized', c.exception.stderr)
+
+    def test_stdio(self):
+        self._start_daemon()
+        self.claw.generate(tests.STUB_CONFIGURATION)
+        script_path = self.workdir / 'script.py'
+        script_path.write_text(SCRIPT)
+        with self.assertRaises(sh.ErrorReturnCode) as c:
+            self.client.script(tests.STUB_CONFIGURATION, script_path, 'ARG',
+                               _in='INPUT')
+        self.assertEqual(c.exception.exit_code, 3)
+        self.assertEqual('ARG:INPUT', c.exception.stdout)
+        self.assertEqual('ERROR', c.exception.stderr)
+
+    def test_settings_per_request(self):
+        self._start_daemon()
+        other_claw_home = self.workdir / 'other'
+        other_claw_home.mkdir()
+        env = os.environ.copy()
+        env[settings.CLAW_SETTINGS] = str(other_claw_home / 'settings')
+        self.client.init(claw_home=other_claw_home, _env=env)
+        self.client.generate(tests.STUB_CONFIGURATION, _env=env)
+        other_configurations = other_claw_home / 'configurations'
+        self.assertTrue((other_configurations /
+                         tests.STUB_CONFIGURATION).exists())
+        self.assertFalse((self.settings.configurations /
+                          tests.STUB_CONFIGURATION).exists())
+
+    def test_idle_timeout(self):
+        process = self._start_daemon(idle_timeout=1)
+        process.wait()
+        self.assertFalse(self.socket_path.exists())
+
+    def _start_daemon(self, idle_timeout=60):
+        process = self.claw.daemon(idle_timeout=idle_timeout, _bg=True)
+        self.addCleanup(self._stop_daemon, process)
+        for _ in range(100):
+            if self.socket_path.exists():
+                return process
+            time.sleep(0.1)
+        self.fail('Failed starting daemon.')
+
+    @staticmethod
+    def _stop_daemon(process):
+        try:
+            process.terminate()
+            process.wait()
+        except Exception:
+            pass
@@ -0,0 +1,97 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import json
+import StringIO
+
+import argh
+import mock
+
+from claw import events
+from claw import tests
+
+
+class EventFollowerTest(tests.BaseTest):
+
+    def setUp(self):
+        super(EventFollowerTest, self).setUp()
+        self.events = []
+        self.statuses = []
+        self.client = mock.Mock()
+        self.client.events.list.side_effect = self._list_events
+        self.client.executions.get.side_effect = self._get_execution
+        self.stream = StringIO.StringIO()
+
+    def test_batches(self):
+        self.events = [self._event(i) for i in range(25)]
+        follower = self._follower(batch_size=10)
+        self.assertEqual(follower.fetch(), 25)
+        self.assertEqual(follower.cursor, 25)
+        self.assertEqual(self.client.events.list.call_count, 3)
+        self.assertEqual(follower.fetch(), 0)
+        self.assertEqual(len(self.stream.getvalue().splitlines()), 25)
+
+    def test_wait(self):
+        events_path = self.workdir / 'events' / 'execution.jsonl'
+        self.events = [self._event(i) for i in range(5)]
+        self.statuses = ['started', 'started', 'terminated']
+        self.client.events.list.side_effect = [
+            self._response(self.events[:2], total=2),
+            self._response([], total=2),
+            self._response(self.events[2:], total=5),
+            self._response([self._event(5, 'workflow_succeeded')],
+                           total=6)]
+        with mock.patch.object(events, 'MIN_INTERVAL', 0):
+            execution = self._follower(events_path=events_path).wait()
+        self.assertEqual(execution.status, 'terminated')
+        self.assertEqual([json.loads(line)['index']
+                          for line in events_path.lines()], range(6))
+
+    def test_timeout(self):
+        self.statuses = ['started'] * 100
+        with mock.patch.object(events, 'MIN_INTERVAL', 0):
+            with self.assertRaises(argh.CommandError) as c:
+                self._follower().wait(timeout=0)
+        self.assertIn('Timed out', str(c.exception))
+
+    def _follower(self, **kwargs):
+        return events.EventFollower(self.client, 'execution',
+                                    stream=self.stream, **kwargs)
+
+    def _list_events(self, execution_id, include_logs, _offset, _size,
+                     _sort):
+        return self._response(self.events[_offset:_offset + _size],
+                              total=len(self.events))
+
+    def _get_execution(self, execution_id):
+        return mock.Mock(id=execution_id, status=self.statuses.pop(0),
+                         deployment_id='deployment')
+
+    @staticmethod
+    def _response(items, total):
+        response = mock.Mock(items=items)
+        response.metadata.pagination.total = total
+        return response
+
+    @staticmethod
+    def _event(index, event_type='task_started'):
+        return {'index': index,
+                'type': 'cloudify_event',
+                'event_type': event_type,
+                '@timestamp': '2016-01-01T00:00:00.000Z',
+                'message': {'text': 'event {0}'.format(index),
+                            'arguments': None},
+                'context': {'deployment_id': 'deployment'}}
@@ -0,0 +1,84 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import mock
+
+from claw import executions
+from claw import tests
+
+
+class WaitTest(tests.BaseTest):
+
+    def setUp(self):
+        super(WaitTest, self).setUp()
+        self.client = mock.Mock()
+        self.ticks = []
+        self.client.executions.list.side_effect = lambda *args, **kwargs: [
+            mock.Mock(id=execution_id, workflow_id=workflow_id,
+                      status=status)
+            for execution_id, workflow_id, status in self.ticks.pop(0)]
+        patcher = mock.patch.object(executions, 'MIN_DELAY', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_wait(self):
+        self.ticks = [
+            [('e1', 'install', 'started'), ('e2', 'install', 'pending'),
+             ('e3', 'install', 'terminated')],
+            [('e1', 'install', 'terminated'), ('e2', 'install', 'started'),
+             ('e3', 'install', 'terminated')],
+            [('e1', 'install', 'terminated'), ('e2', 'install', 'failed'),
+             ('e3', 'install', 'terminated')]]
+        self.assertEqual(executions.wait(self.client, 'dep', timeout=10),
+                         [])
+        self.assertEqual(self.client.executions.list.call_count, 3)
+        self.assertFalse(self.client.executions.get.called)
+        self.assertFalse(self.client.executions.cancel.called)
+
+    def test_timeout(self):
+        self.ticks = [[('e1', 'install', 'started')]] * 100
+        not_ended = executions.wait(self.client, 'dep', timeout=0)
+        self.assertEqual([e.id for e in not_ended], ['e1'])
+        self.assertFalse(self.client.executions.update.called)
+
+    def test_cancel(self):
+        self.ticks = [
+            [('e1', 'install', 'started'),
+             ('e2', executions.STOP_DEPLOYMENT_ENVIRONMENT, 'started'),
+             ('e3', executions.CREATE_DEPLOYMENT_ENVIRONMENT, 'started'),
+             ('e4', executions.CREATE_DEPLOYMENT_ENVIRONMENT, 'failed')]]
+        self.assertEqual(executions.wait(self.client, 'dep', cancel=True,
+                                         timeout=0), [])
+        self.assertEqual(
+            sorted(c[0][0] for c in
+                   self.client.executions.cancel.call_args_list),
+            ['e1', 'e3'])
+        self.assertEqual(
+            sorted((c[0][0], c[1]['status']) for c in
+                   self.client.executions.update.call_args_list),
+            [('e1', executions.CANCELLED), ('e2', executions.CANCELLED),
+             ('e3', executions.TERMINATED), ('e4', executions.TERMINATED)])
+
+    def test_cancel_failure(self):
+        self.ticks = [[('e1', 'install', 'started'),
+                       ('e2', 'install', 'started')],
+                      [('e1', 'install', 'cancelled'),
+                       ('e2', 'install', 'cancelled')]]
+        self.client.executions.cancel.side_effect = [RuntimeError('error'),
+                                                     None]
+        self.assertEqual(executions.wait(self.client, 'dep', cancel=True,
+                                         timeout=10), [])
+        self.assertEqual(self.client.executions.cancel.call_count, 2)
@@ -0,0 +1,112 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import json
+import os
+import sys
+
+import sh
+
+from claw import tests
+
+
+HEAVY_MODULES = [
+    'cosmo_tester',
+    'cloudify_rest_client',
+    'cloudify_cli',
+    'requests',
+    'fabric',
+    'sh'
+]
+
+# Runs claw in a fresh interpreter and dumps the names of all loaded modules
+# on exit. argcomplete leaves through os._exit (skipping atexit handlers) and
+# writes its completions to fd 8, so both are taken care of.
+DRIVER = '''
+import atexit
+import json
+import os
+import sys
+
+modules_path = sys.argv[1]
+completions_path = sys.argv[2]
+sys.argv = ['claw'] + sys.argv[3:]
+
+
+def dump_modules():
+    with open(modules_path, 'w') as f:
+        json.dump(sorted(k for k, v in sys.modules.items() if v), f)
+atexit.register(dump_modules)
+_exit = os._exit
+
+
+def exit_hook(code):
+    dump_modules()
+    _exit(code)
+os._exit = exit_hook
+os.dup2(os.open(completions_path, os.O_WRONLY | os.O_CREAT), 8)
+
+from claw import main
+main.main()
+'''
+
+
+class ImportBudgetTest(tests.BaseTestWithInit):
+
+    def test_help(self):
+        self._assert_no_heavy_imports(['--help'])
+
+    def test_command_help(self):
+        self._assert_no_heavy_imports(['generate', '--help'])
+
+    def test_cdconfiguration(self):
+        self._assert_no_heavy_imports(['cdconfiguration'])
+
+    def test_completion(self):
+        self.claw.generate(tests.STUB_CONFIGURATION)
+        for comp_line, expected in [
+                ('claw ', 'generate'),
+                ('claw gen', 'generate'),
+                ('claw generate ', tests.STUB_CONFIGURATION),
+                ('claw status ', tests.STUB_CONFIGURATION),
+                ('claw deploy {0} '.format(tests.STUB_CONFIGURATION),
+                 tests.STUB_BLUEPRINT)]:
+            completions = self._assert_no_heavy_imports([], env={
+                '_ARGCOMPLETE': '1',
+                'COMP_LINE': comp_line,
+                'COMP_POINT': str(len(comp_line))
+            })
+            self.assertIn(expected, completions)
+
+    def _assert_no_heavy_imports(self, args, env=None):
+        driver_path = self.workdir / 'driver.py'
+        modules_path = self.workdir / 'modules.json'
+        completions_path = self.workdir / 'completions'
+        driver_path.write_text(DRIVER)
+        completions_path.write_text('')
+        process_env = os.environ.copy()
+        process_env.update(env or {})
+        sh.Command(sys.executable)(driver_path,
+                                   modules_path,
+                                   completions_path,
+                                   *args,
+                                   _env=process_env)
+        loaded = json.loads(modules_path.text())
+        heavy = [m for m in loaded
+                 if any(m == h or m.startswith('{0}.'.format(h))
+                        for h in HEAVY_MODULES)]
+        self.assertEqual([], heavy)
+        return completions_path.text()
@@ -100,6 +100,31 @@ class TestPatcher(tests.BaseTest):
             [{'key1': 'string value11'},
              {'key1': 'string value12', 'key2': 'string value22'}])
 
+    def test_builtin_filter_list_rules(self):
+        strings = ['node_one', 'node_two', 'host', 'a.b', 'axb']
+        self.assertEqual(
+            patcher.filter_list(strings, ['node', 'node_t', 'a.b']),
+            ['node_one', 'node_two', 'a.b'])
+        self.assertEqual(patcher.filter_list(strings, ['']), strings)
+        self.assertEqual(patcher.filter_list(strings, []), [])
+        dicts = [{'name': 'one', 'type': 'compute'},
+                 {'name': 'two', 'tags': ['a', 'b']},
+                 {'name': 'three', 'type': None},
+                 {'other': 'value'}]
+        self.assertEqual(patcher.filter_list(dicts, ['other']), [dicts[3]])
+        self.assertEqual(patcher.filter_list(dicts, [{'tags': 'b'}]),
+                         [dicts[1]])
+        self.assertEqual(patcher.filter_list(dicts, [{'type': 'comp'},
+                                                     {'name': 'thr'}]),
+                         [dicts[0], dicts[2]])
+        self.assertEqual(patcher.filter_list(dicts, [{'name': 'o',
+                                                      'type': 'pute'}]),
+                         [dicts[0]])
+        self.assertEqual(patcher.filter_list(dicts, [{'type': ''}]), dicts)
+        self.assertEqual(patcher.filter_list(dicts, [{}]), dicts)
+        with self.assertRaises(NotImplementedError):
+            patcher.filter_list(strings, ['node', 1])
+
     def test_builtin_filter_dict(self):
         test_yaml = {
             'a': {
@@ -144,6 +169,40 @@ class TestPatcher(tests.BaseTest):
             'key1': 'VALUE1', 'key2': 'VALUE2', 'key3': 'default'
         })
 
+    def test_apply(self):
+        self.write_yaml({
+            'a': {'b': 1, 'c': 2},
+            'l': [{'x': 1}, {'x': 2}],
+            'm': [1, 2]
+        })
+        with patcher.YamlPatcher(self.yaml_path) as patch:
+            patch.apply({
+                'a.b': 'B',
+                'a.d.e': 'E',
+                'l[1].x': 'X',
+                'm[0]': 'M',
+                'm[append]': 3,
+                'dotted\\.key': 'D',
+                'n': {'o': 'O'},
+                'n.p': 'P',
+                'a.c': {'func': '{0}:func_current_value'.format(__name__)}
+            })
+        self.assertEqual(self.read_yaml(), {
+            'a': {'b': 'B', 'c': 4, 'd': {'e': 'E'}},
+            'l': [{'x': 1}, {'x': 'X'}],
+            'm': ['M', 2, 3],
+            'dotted.key': 'D',
+            'n': {'o': 'O', 'p': 'P'}
+        })
+
+    def test_apply_illegal_path(self):
+        self.write_yaml({'a': {'b': 1}})
+        for prop_path in ['a[0].b', 'a[append]', 'a[append].b', 'c[0]']:
+            with self.assertRaises(RuntimeError) as c:
+                with patcher.YamlPatcher(self.yaml_path) as patch:
+                    patch.apply({prop_path: 1})
+            self.assertIn(prop_path, str(c.exception))
+
     def write_yaml(self, obj):
         self.yaml_path.write_text(yaml.safe_dump(obj))
 
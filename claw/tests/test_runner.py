@@ -0,0 +1,138 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import os
+import signal
+import StringIO
+import threading
+import time
+
+from claw import runner
+from claw import tests
+
+
+class RunnerTest(tests.BaseTest):
+
+    def setUp(self):
+        super(RunnerTest, self).setUp()
+        self.stdout = StringIO.StringIO()
+        self.stderr = StringIO.StringIO()
+
+    def test_command(self):
+        operation = runner.Command('cfy').blueprints.upload(
+            'blueprint.yaml', blueprint_id='bp', l=True, i='inputs.yaml',
+            include_logs=False, timeout=None, _name='upload', _timeout=10)
+        self.assertEqual(operation.args, [
+            'cfy', 'blueprints', 'upload', 'blueprint.yaml',
+            '--blueprint-id=bp', '-i', 'inputs.yaml', '-l'])
+        self.assertEqual(operation.name, 'upload')
+        self.assertEqual(operation.timeout, 10)
+
+    def test_run(self):
+        operations = [
+            self._sh('echo out {0}; echo err {0} >&2; exit {0}'.format(i),
+                     name='op{0}'.format(i),
+                     log_path=self.workdir / 'logs' / 'op{0}.log'.format(i))
+            for i in range(3)]
+        self._run(operations)
+        self.assertEqual([o.exit_code for o in operations], [0, 1, 2])
+        self.assertEqual([o.ok for o in operations], [True, False, False])
+        self.assertIn('exit code 1', operations[1].error)
+        for i in range(3):
+            self.assertIn('[op{0}] out {0}\n'.format(i),
+                          self.stdout.getvalue())
+            self.assertIn('[op{0}] err {0}\n'.format(i),
+                          self.stderr.getvalue())
+            self.assertEqual(
+                sorted((self.workdir / 'logs' / 'op{0}.log'.format(i))
+                       .lines(retain=False)),
+                ['err {0}'.format(i), 'out {0}'.format(i)])
+
+    def test_concurrency(self):
+        operations = [self._sh('sleep 1') for _ in range(4)]
+        start = time.time()
+        self._run(operations, jobs=2)
+        duration = time.time() - start
+        self.assertTrue(all(o.ok for o in operations))
+        self.assertGreaterEqual(duration, 2)
+        self.assertLess(duration, 3)
+
+    def test_timeout(self):
+        operation = self._sh('echo started; sleep 30', timeout=1)
+        start = time.time()
+        self._run([operation])
+        self.assertLess(time.time() - start, 10)
+        self.assertTrue(operation.timed_out)
+        self.assertFalse(operation.ok)
+        self.assertIn('timed out', operation.error)
+        self.assertEqual(self.stdout.getvalue(), 'started\n')
+
+    def test_not_found(self):
+        operation = runner.Operation(['claw-no-such-command'])
+        self._run([operation])
+        self.assertEqual(operation.exit_code, runner.NOT_FOUND_EXIT_CODE)
+
+    def test_wait(self):
+        self._sh('exit 0').wait(stdout=self.stdout, stderr=self.stderr)
+        with self.assertRaises(runner.OperationError) as c:
+            self._sh('exit 3').wait(stdout=self.stdout, stderr=self.stderr)
+        self.assertEqual(c.exception.operation.exit_code, 3)
+
+    def test_partial_line(self):
+        log_path = self.workdir / 'partial.log'
+        self._run([self._sh('printf partial', name='op',
+                            log_path=log_path)])
+        self.assertEqual(self.stdout.getvalue(), '[op] partial\n')
+        self.assertEqual(log_path.text(), 'partial')
+
+    def test_direct(self):
+        # A single operation writes to the (real) streams itself
+        stdout_path = self.workdir / 'stdout'
+        stderr_path = self.workdir / 'stderr'
+        with open(stdout_path, 'w') as stdout:
+            with open(stderr_path, 'w') as stderr:
+                operation = self._sh('echo out; echo err >&2')
+                runner.run([operation], stdout=stdout, stderr=stderr)
+        self.assertEqual(operation.exit_code, 0)
+        self.assertEqual(stdout_path.text(), 'out\n')
+        self.assertEqual(stderr_path.text(), 'err\n')
+
+    def test_interrupt(self):
+        operation = self._sh('trap "echo interrupted; exit 3" INT; '
+                             'echo started; '
+                             'while true; do sleep 0.1; done')
+        timer = threading.Timer(1, os.kill, [os.getpid(), signal.SIGINT])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        with self.assertRaises(KeyboardInterrupt):
+            self._run([operation])
+        self.assertEqual(operation.exit_code, 3)
+        self.assertFalse(operation.timed_out)
+        self.assertEqual(self.stdout.getvalue(), 'started\ninterrupted\n')
+
+    def test_output(self):
+        operation = self._sh('echo out')
+        with runner.output(self.stdout, self.stderr):
+            runner.run([operation])
+        self.assertEqual(self.stdout.getvalue(), 'out\n')
+
+    def _run(self, operations, jobs=runner.DEFAULT_JOBS):
+        return runner.run(operations, jobs=jobs, stdout=self.stdout,
+                          stderr=self.stderr)
+
+    @staticmethod
+    def _sh(script, **kwargs):
+        return runner.Operation(['sh', '-c', script], **kwargs)
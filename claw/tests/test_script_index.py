@@ -0,0 +1,77 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import json
+import os
+import time
+
+from claw import script_index
+from claw import tests
+
+
+SCRIPT = '''"""My script docstring."""
+def script(arg1, arg2='value'):
+    pass
+def other():
+    pass
+'''
+
+
+class ScriptIndexTest(tests.BaseTestWithInit):
+
+    def setUp(self):
+        super(ScriptIndexTest, self).setUp()
+        self.scripts_dir = self.settings.default_scripts_dir
+        self.script_path = self.scripts_dir / 'my_script.py'
+        self.script_path.write_text(SCRIPT)
+        self.index_path = (self.settings.cache_dir /
+                           script_index.INDEX_NAME)
+
+    def test_index(self):
+        self.claw('--help')
+        scripts = self._read_index()['dirs'][self.scripts_dir]['scripts']
+        script = [s for s in scripts if s['name'] == 'my-script'][0]
+        self.assertEqual(script['path'], self.script_path)
+        self.assertEqual(script['doc'], 'My script docstring.')
+        self.assertEqual(script['functions'], {
+            'script': 'arg1, arg2=...',
+            'other': ''
+        })
+        output = self.claw('my-script', '--help').stdout
+        self.assertIn('My script docstring.', output)
+        self.assertIn('script(arg1, arg2=...)', output)
+
+    def test_unchanged_dir_is_not_rescanned(self):
+        self._age_scripts_dir()
+        self.claw('--help')
+        index = self._read_index()
+        entry = index['dirs'][self.scripts_dir]
+        self.assertFalse(entry['racy'])
+        for script in entry['scripts']:
+            script['doc'] = 'FROM INDEX'
+        self.index_path.write_text(json.dumps(index))
+        self.assertIn('FROM INDEX', self.claw('my-script', '--help').stdout)
+        self.script_path.remove()
+        self.assertNotIn('my-script', self.claw('--help').stdout)
+
+    def _age_scripts_dir(self):
+        past = time.time() - 60
+        for script_path in self.scripts_dir.files():
+            os.utime(script_path, (past, past))
+        os.utime(self.scripts_dir, (past, past))
+
+    def _read_index(self):
+        return json.loads(self.index_path.text())
@@ -15,6 +15,7 @@
 ############
 
 import os
+import time
 
 import argh
 import yaml
@@ -113,6 +114,27 @@ class TestSettings(tests.BaseTest):
                          {'key3': 'value3',
                           'variables': {'c': 'C'}})
 
+    def test_load_suites_yaml_parses_once(self):
+        self.test_load_suites_yaml()
+        past = time.time() - 60
+        for yaml_path in [self.workdir / 'suites.yaml',
+                          self.mock_suites_yaml]:
+            os.utime(yaml_path, (past, past))
+        expected = {'key1': 'value1', 'variables': {'a': 'A', 'b': 'B'}}
+        with patch('yaml.load', wraps=yaml.load) as load:
+            suites_yaml = self.settings.load_suites_yaml()
+            suites_yaml['variables']['a'] = 'MODIFIED'
+            suites_yaml['key1'] = 'MODIFIED'
+            for _ in range(3):
+                self.assertEqual(self.settings.load_suites_yaml(), expected)
+            self.assertEqual(2, load.call_count)
+            self.mock_suites_yaml.write_text(yaml.safe_dump({
+                'variables': {'b': 'NEW_B'}
+            }))
+            self.assertEqual(self.settings.load_suites_yaml(),
+                             {'key1': 'value1',
+                              'variables': {'a': 'A', 'b': 'NEW_B'}})
+
     def _write(self):
         self.settings.write_settings(self.workdir,
                                      self.mock_suites_yaml)
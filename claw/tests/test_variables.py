@@ -0,0 +1,64 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import unittest
+
+from cosmo_tester.framework import util
+
+from claw.variables import Variables
+
+
+class VariablesTest(unittest.TestCase):
+
+    def test_same_as_process_variables(self):
+        suites_yaml = {
+            'variables': {
+                'a': 'A',
+                'num': 5,
+                'properties': {'key': 'value'}
+            }
+        }
+        unprocessed = {
+            'plain': 'plain value',
+            'var': '{{a}}',
+            'mixed': 'before {{ a }} after {{num + 1}}',
+            'nested_var': '{{properties.key}}',
+            'undefined': '{{no_such_variable}}',
+            'statement': '{% if num > 3 %}big{% endif %}',
+            'trailing_newline': 'value\n',
+            'crlf': 'line1\r\nline2',
+            'unicode': u'\u05e9 {{a}}',
+            'number': 5,
+            'boolean': True,
+            'list': ['{{a}}'],
+            'dict': {'key': '{{a}}'},
+            'none': None
+        }
+        variables = Variables(suites_yaml['variables'])
+        for _ in range(2):
+            processed = variables.process(unprocessed)
+            expected = util.process_variables(suites_yaml, unprocessed)
+            self.assertEqual(processed, expected)
+            for key, value in processed.items():
+                self.assertEqual(type(value), type(expected[key]))
+
+    def test_values_copied(self):
+        unprocessed = {'list': ['{{a}}'], 'dict': {'key': {'nested': 1}}}
+        processed = Variables({'a': 'A'}).process(unprocessed)
+        processed['list'].append('new')
+        processed['dict']['key']['nested'] = 2
+        self.assertEqual(unprocessed,
+                         {'list': ['{{a}}'], 'dict': {'key': {'nested': 1}}})
@@ -0,0 +1,48 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import os
+import unittest
+
+import mock
+import yaml
+
+from claw import resources
+from claw import yaml_io
+
+
+class YamlIOTest(unittest.TestCase):
+
+    def test_same_as_pyyaml(self):
+        for template in ['suites.template.yaml', 'blueprints.template.yaml']:
+            text = resources.get('templates/{0}'.format(template))
+            obj = yaml_io.load(text)
+            self.assertEqual(obj, yaml.safe_load(text))
+            obj['unicode'] = u'\u05e9\u05dc\u05d5\u05dd'
+            obj['multiline'] = 'line1\nline2\n'
+            for default_flow_style in [True, False, None]:
+                self.assertEqual(
+                    yaml_io.dump(obj, default_flow_style=default_flow_style),
+                    yaml.safe_dump(obj,
+                                   default_flow_style=default_flow_style))
+
+    @unittest.skipUnless(os.path.exists('/proc/self/status'), 'No /proc')
+    def test_umask_untouched(self):
+        umask = os.umask(0o027)
+        self.addCleanup(os.umask, umask)
+        with mock.patch.object(yaml_io.os, 'umask') as set_umask:
+            self.assertEqual(yaml_io._read_umask(), 0o027)
+        self.assertFalse(set_umask.called)
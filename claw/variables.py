@@ -0,0 +1,57 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import copy
+
+from claw.lazy import lazy_import
+
+jinja2 = lazy_import('jinja2')
+
+# template source -> compiled template, shared by all Variables instances
+_templates = {}
+
+
+class Variables(object):
+    """Renders `{{...}}` templates in override dicts against `variables`.
+
+    A drop-in replacement for cosmo_tester's `util.process_variables`: top
+    level string values of the processed dict are rendered as jinja2
+    templates, everything else is deep copied. Each template string is
+    compiled once per process and the variables are resolved once, so many
+    override dicts can be processed cheaply against the same variables.
+    """
+
+    def __init__(self, variables):
+        self.variables = dict(variables or {})
+
+    def process(self, unprocessed):
+        return dict((key, self.render(value))
+                    if isinstance(value, basestring)
+                    else (key, copy.deepcopy(value))
+                    for key, value in unprocessed.items())
+
+    def render(self, source):
+        if not ('{' in source or '\r' in source or source.endswith('\n')):
+            # Rendering plain text returns it as is
+            return unicode(source)
+        return _compile(source).render(self.variables)
+
+
+def _compile(source):
+    template = _templates.get(source)
+    if template is None:
+        template = _templates[source] = jinja2.Template(source)
+    return template
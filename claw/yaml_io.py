@@ -0,0 +1,153 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+############
+
+import cPickle
+import os
+import stat as stat_module
+import tempfile
+
+import yaml
+
+from claw.lazy import lazy_import
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# claw.cache imports claw.settings which imports this module
+cache = lazy_import('claw.cache')
+
+# abspath -> (version, text, pickled document). text is only kept for
+# entries recorded while the file was racy (see claw.cache.RACY_WINDOW): the
+# file may have changed since without its version changing, so its content
+# is compared before the entry is used.
+_documents = {}
+
+
+def load(stream):
+    """yaml.safe_load, using libyaml when available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(obj, stream=None, **kwargs):
+    """yaml.safe_dump, using libyaml when available."""
+    return yaml.dump(obj, stream, Dumper=SafeDumper, **kwargs)
+
+
+def load_file(file_path):
+    """Parsed content of the yaml file at `file_path`.
+
+    Files are parsed once per process (per version of the file, as identified
+    by its mtime, size and inode). Every call returns a private copy of the
+    document, so callers may modify it freely.
+    """
+    file_path = os.path.abspath(file_path)
+    with open(file_path) as f:
+        stat = os.fstat(f.fileno())
+        cached = _documents.get(file_path)
+        if cached and cached[0] == _version(stat):
+            if cached[1] is None:
+                return cPickle.loads(cached[2])
+            text = f.read()
+            if text == cached[1]:
+                _documents[file_path] = _entry(stat, text, cached[2])
+                return cPickle.loads(cached[2])
+        else:
+            text = f.read()
+    document = load(text)
+    _remember(file_path, stat, text, document)
+    return document
+
+
+def dump_file(obj, file_path, **kwargs):
+    """Atomically write `obj` as yaml to `file_path` (see `dump` for
+    `kwargs`).
+
+    The written document is remembered, so a following `load_file` of
+    `file_path` does not parse it again.
+    """
+    file_path = os.path.abspath(file_path)
+    text = dump(obj, **kwargs)
+    # Replace the target of a symlinked file, not the symlink itself
+    _atomic_write(os.path.realpath(file_path), text)
+    _remember(file_path, os.stat(file_path), text, obj)
+
+
+def write_file(file_path, text):
+    """Atomically write `text` to `file_path`.
+
+    Like `dump_file`, the file is replaced rather than written in place, so
+    files of generated configurations that are linked from the store (see
+    `claw.store`) are not changed in other configurations.
+    """
+    file_path = os.path.abspath(file_path)
+    _atomic_write(os.path.realpath(file_path), text)
+    _documents.pop(file_path, None)
+
+
+def _atomic_write(file_path, text):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path),
+                                    prefix='.{0}.'.format(
+                                        os.path.basename(file_path)))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        # mkstemp creates the file with 0600, keep the mode the file would
+        # have had if written in place
+        try:
+            mode = stat_module.S_IMODE(os.stat(file_path).st_mode)
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read_umask():
+    """The umask of the process, read from /proc where possible, as setting
+    it (to read it) changes it for all threads."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (IOError, ValueError, IndexError):
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once, when imported (before claw starts threads)
+_UMASK = _read_umask()
+
+
+def _version(stat):
+    return stat.st_mtime, stat.st_size, stat.st_ino
+
+
+def _remember(file_path, stat, text, document):
+    _documents[file_path] = _entry(stat, text, cPickle.dumps(
+        document, cPickle.HIGHEST_PROTOCOL))
+
+
+def _entry(stat, text, pickled_document):
+    if not cache.is_racy(stat.st_mtime):
+        text = None
+    return _version(stat), text, pickled_document
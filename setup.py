@@ -37,6 +37,7 @@ setup(
     entry_points={
         'console_scripts': [
             'claw = claw.main:main',
+            'claw-client = claw.daemon:client_main',
         ],
     }
 )